@@ -17,15 +17,24 @@ from . import age
 from .age import *
 from .models import *
 from .builder import ResultHandler, DummyResultHandler, parseAgeValue, newResultHandler
+from .decoder import AgtypeDecoder
+from .encoder import Agtype, toAgtype
+from .cache import StatementCache, IdentityMap
+from .pool import AgePool
+from .observer import QueryObserver, QueryEvent, LatencyHistogram
+from .sampler import SlowQuerySampler, QueryPlan
+from .columnar import ColumnarResult, Column, CategoricalColumn
 from . import VERSION 
 
 def version():
     return VERSION.VERSION
 
 
-def connect(dsn=None, graph=None, connection_factory=None, cursor_factory=None, **kwargs):
-        ag = Age()
-        ag.connect(dsn=dsn, graph=graph, connection_factory=connection_factory, cursor_factory=cursor_factory, **kwargs)
+def connect(dsn=None, graph=None, connection_factory=None, cursor_factory=None, statementCacheSize=DEFAULT_STATEMENT_CACHE_SIZE,
+            resultHandler=None, **kwargs):
+        ag = Age(statementCacheSize)
+        ag.connect(dsn=dsn, graph=graph, connection_factory=connection_factory, cursor_factory=cursor_factory,
+                   resultHandler=resultHandler, **kwargs)
         return ag
 
 # Dummy ResultHandler
@@ -14,12 +14,25 @@
 # under the License.
 
 import re 
+import weakref
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 import psycopg2 
 from psycopg2 import errors
 from psycopg2 import extensions as ext
 from psycopg2 import sql
 from .exceptions import *
-from .builder import ResultHandler , parseAgeValue, newResultHandler
+from .models import Graph
+# ResultHandler and parseAgeValue are not used here but stay importable from age.age.
+from .builder import ResultHandler , parseAgeValue, newResultHandler, newAgeTypecaster
+from .cache import StatementCache, DEFAULT_STATEMENT_CACHE_SIZE
+from .decoder import AgtypeDecoder
+from .encoder import toAgtype, registerAdapters
+from .bulk import BulkLoadResult, bulkLoadVertices, bulkLoadEdges, DEFAULT_EDGE_BATCH_SIZE
+from .parallel import registerRawAgtype, iterDecoded, DEFAULT_PARALLEL_CHUNK_SIZE
+from .columnar import ColumnarResult, fetchColumnar, DEFAULT_COLUMNAR_CHUNK_SIZE
+from .export import exportNdjson, ROW_OBJECT, DEFAULT_EXPORT_CHUNK_SIZE
+from .observer import QueryEvent, QueryObserver, ObservedCursor, observedCursorClass, observeDecoding
 
 
 _EXCEPTION_NoConnection = NoConnection()
@@ -27,7 +40,41 @@ _EXCEPTION_GraphNotSet = GraphNotSet()
 
 WHITESPACE = re.compile('\s')
 
-def setUpAge(conn:ext.connection, graphName:str):
+DEFAULT_BATCH_SIZE = 1000
+BATCH_SAVEPOINT = "age_exec_batch"
+
+# Names for the server side cursors used by streaming execCypher.
+_streamCursorSeq = itertools.count(1)
+
+# Prepared statement cache per connection, shared by Age and the module functions.
+_statementCaches = weakref.WeakKeyDictionary()
+
+# agtype result handler per connection, used by the connection's typecaster.
+_resultHandlers = weakref.WeakKeyDictionary()
+# agtype type oid per connection.
+_agtypeOids = weakref.WeakKeyDictionary()
+# QueryObservers per connection, as a tuple. Connections without any have no entry.
+_observers = weakref.WeakKeyDictionary()
+
+def resultHandlerFor(conn:ext.connection):
+    return _resultHandlers.get(conn)
+
+# Decode the results of 'cursor' through identityMap, so each vertex or edge id
+# is built once across the cursor's rows. Must be called before the cursor executes.
+# The decoder otherwise keeps the settings of the connection's result handler.
+def useIdentityMap(cursor:ext.cursor, identityMap):
+    oid = _agtypeOids.get(cursor.connection)
+    if oid == None:
+        raise AgeNotSet()
+    handler = _resultHandlers.get(cursor.connection)
+    if isinstance(handler, AgtypeDecoder):
+        decoder = AgtypeDecoder(identityMap, jsonFastPath=handler.jsonFastPath, lazyProperties=handler.lazyProperties)
+    else:
+        decoder = AgtypeDecoder(identityMap)
+    ext.register_type(ext.new_type((oid,), 'AGETYPE', newAgeTypecaster(decoder)), cursor)
+    return cursor
+
+def setUpAge(conn:ext.connection, graphName:str, resultHandler=None):
     with conn.cursor() as cursor:
         cursor.execute("LOAD 'age';")
         cursor.execute("SET search_path = ag_catalog, '$user', public;")
@@ -37,9 +84,15 @@ def setUpAge(conn:ext.connection, graphName:str):
         if oid == None :
             raise AgeNotSet()
 
-        AGETYPE = ext.new_type((oid,), 'AGETYPE', parseAgeValue)
-        ext.register_type(AGETYPE)
-        # ext.register_adapter(Path, marshalAgtValue)
+        if resultHandler == None:
+            resultHandler = newResultHandler()
+        _resultHandlers[conn] = resultHandler
+        _agtypeOids[conn] = oid
+
+        # Registered on the connection only: every connection decodes with its own handler.
+        AGETYPE = ext.new_type((oid,), 'AGETYPE', newAgeTypecaster(resultHandler))
+        ext.register_type(AGETYPE, conn)
+        registerAdapters()
 
         # Check graph exists
         if graphName != None:
@@ -60,10 +113,7 @@ def deleteGraph(conn:ext.connection, graphName:str):
         conn.commit()
 
 
-def buildCypher(graphName:str, cypherStmt:str, columns:list) ->str:
-    if graphName == None:
-        raise _EXCEPTION_GraphNotSet
-    
+def buildCypherColumns(columns:list) ->str:
     columnExp=[]
     if columns != None and len(columns) > 0:
         for col in columns:
@@ -75,13 +125,188 @@ def buildCypher(graphName:str, cypherStmt:str, columns:list) ->str:
                 columnExp.append(col + " agtype")
     else:
         columnExp.append('v agtype')
+    return ','.join(columnExp)
+
+def buildCypher(graphName:str, cypherStmt:str, columns:list) ->str:
+    if graphName == None:
+        raise _EXCEPTION_GraphNotSet
 
     stmtArr = []
     stmtArr.append("SELECT * from cypher(NULL,NULL) as (")
-    stmtArr.append(','.join(columnExp))
+    stmtArr.append(buildCypherColumns(columns))
+    stmtArr.append(");")
+    return "".join(stmtArr)
+
+# cypher() only accepts a dollar-quoted query string.
+def dollarQuote(text:str) ->str:
+    tag = "$cypher$"
+    seq = 0
+    while tag in text:
+        seq += 1
+        tag = "$cypher" + str(seq) + "$"
+    return tag + text + tag
+
+# PREPARE a cypher statement taking its parameters as an agtype map($1).
+def buildPrepareStatement(conn:ext.connection, name:str, graphName:str, cypherStmt:str, columns:list) ->str:
+    if graphName == None:
+        raise _EXCEPTION_GraphNotSet
+
+    stmtArr = []
+    stmtArr.append(sql.SQL("PREPARE {name}(agtype) AS SELECT * from cypher({graphName}, ").format(
+        name=sql.Identifier(name), graphName=sql.Literal(graphName)).as_string(conn))
+    stmtArr.append(dollarQuote(cypherStmt))
+    stmtArr.append(", $1) as (")
+    stmtArr.append(buildCypherColumns(columns))
     stmtArr.append(");")
     return "".join(stmtArr)
 
+# age_prepare_cypher followed by the cypher(NULL,NULL) SELECT as one batch,
+# so a cypher call costs a single round trip.
+def buildPreparedCypher(conn:ext.connection, graphName:str, cypherStmt:str, columns:list) ->str:
+    stmt = buildCypher(graphName, cypherStmt, columns)
+    preparedStmt = sql.SQL("SELECT * FROM age_prepare_cypher({graphName},{cypherStmt});").format(
+        graphName=sql.Literal(graphName), cypherStmt=sql.Literal(cypherStmt))
+    return preparedStmt.as_string(conn) + stmt
+
+# Single SELECT with the graph name and query inline, usable where only one statement
+# is allowed (e.g. the DECLARE of a server side cursor).
+def buildInlineCypher(conn:ext.connection, graphName:str, cypherStmt:str, columns:list) ->str:
+    if graphName == None:
+        raise _EXCEPTION_GraphNotSet
+
+    stmtArr = []
+    stmtArr.append(sql.SQL("SELECT * from cypher({graphName}, ").format(graphName=sql.Literal(graphName)).as_string(conn))
+    stmtArr.append(dollarQuote(cypherStmt))
+    stmtArr.append(") as (")
+    stmtArr.append(buildCypherColumns(columns))
+    stmtArr.append(");")
+    return "".join(stmtArr)
+
+# Serialize cypher parameters into the agtype map bound to cypher()'s third argument.
+def buildCypherParams(params:dict) ->str:
+    if params == None:
+        return "{}"
+    if not isinstance(params, dict):
+        raise TypeError("cypher parameters must be a dict, not " + type(params).__name__)
+    return toAgtype(params)
+
+# Build the statements executing a cached prepared statement.
+# Returns (prepare stmt, EXECUTE stmt, cache key). The prepare stmt is None on a cache hit;
+# on a miss it deallocates the evicted statements and PREPAREs this one, and must be run
+# with prepareCached before the EXECUTE.
+def buildExecuteCypher(conn:ext.connection, cache:StatementCache, graphName:str, cypherStmt:str, columns:list, params:dict) ->tuple:
+    # Checked before the cache is touched: a put() that fails would lose the statements it evicted.
+    if graphName == None:
+        raise _EXCEPTION_GraphNotSet
+    agParams = buildCypherParams(params)
+
+    key = (graphName, cypherStmt, tuple(columns) if columns != None else None)
+    name = cache.get(key)
+    prepareStmt = None
+    if name == None:
+        name, evicted = cache.put(key)
+        stmtArr = []
+        for old in evicted:
+            stmtArr.append(sql.SQL("DEALLOCATE {name};").format(name=sql.Identifier(old)).as_string(conn))
+        try:
+            stmtArr.append(buildPrepareStatement(conn, name, graphName, cypherStmt, columns))
+        except Exception:
+            cache.discard(key)
+            raise
+        prepareStmt = "".join(stmtArr)
+
+    executeStmt = sql.SQL("EXECUTE {name}({params});").format(
+        name=sql.Identifier(name), params=sql.Literal(agParams)).as_string(conn)
+    return prepareStmt, executeStmt, key
+
+# Run the prepare stmt of buildExecuteCypher on its own, so a failure is known to come
+# from PREPARE and the statement does not exist. Once prepared, a statement stays on the
+# server even if the transaction is rolled back, so it stays in the cache too.
+def prepareCached(cursor:ext.cursor, cache:StatementCache, key:tuple, prepareStmt:str):
+    try:
+        cursor.execute(prepareStmt)
+    except Exception:
+        cache.discard(key)
+        raise
+
+# Prepared statement cache used for cypher parameters on conn.
+def statementCacheFor(conn:ext.connection) -> StatementCache:
+    cache = _statementCaches.get(conn)
+    if cache == None:
+        cache = StatementCache()
+        _statementCaches[conn] = cache
+    return cache
+
+# Vertices, edges and their adjacency from result rows, collected in one pass.
+# rows is a cursor or any iterable of rows.
+def toGraph(rows, stmt:str=None) -> Graph:
+    graph = Graph(stmt)
+    for row in rows:
+        graph.addRow(row)
+    return graph
+
+
+# Cursor returned by execCypher when the connection has no cursor_factory of its own.
+class AgeCursor(ext.cursor):
+    # Fetch the remaining rows into a Graph.
+    def toGraph(self) -> Graph:
+        stmt = self.query
+        if stmt != None:
+            stmt = stmt.decode(ext.encodings[self.connection.encoding])
+        return toGraph(self, stmt)
+
+    # Fetch the remaining rows into typed columns, see age.columnar.
+    def fetchColumnar(self, props:list=None, column:int=0, chunkSize:int=DEFAULT_COLUMNAR_CHUNK_SIZE) -> ColumnarResult:
+        return fetchColumnar(self, props=props, column=column, chunkSize=chunkSize)
+
+    # Write the remaining rows to 'out' as NDJSON, see age.export.
+    def exportNdjson(self, out, rowFormat:str=ROW_OBJECT, chunkSize:int=DEFAULT_EXPORT_CHUNK_SIZE) -> int:
+        return exportNdjson(self, out, rowFormat=rowFormat, chunkSize=chunkSize)
+
+
+def newCursor(conn:ext.connection, **kwargs) -> ext.cursor:
+    factory = conn.cursor_factory
+    if factory == None:
+        factory = AgeCursor
+    if conn in _observers:
+        factory = observedCursorClass(factory)
+    if factory is not conn.cursor_factory:
+        kwargs["cursor_factory"] = factory
+    return conn.cursor(**kwargs)
+
+
+# Register a QueryObserver for the cypher queries run on conn.
+def addObserver(conn:ext.connection, observer:QueryObserver):
+    _observers[conn] = _observers.get(conn, ()) + (observer,)
+
+def removeObserver(conn:ext.connection, observer:QueryObserver):
+    observers = tuple(o for o in _observers.get(conn, ()) if o is not observer)
+    if len(observers) > 0:
+        _observers[conn] = observers
+    else:
+        _observers.pop(conn, None)
+
+# Start a QueryEvent for stmt about to run on cursor, or None without observers.
+# explain builds the same query as a single statement, e.g. for EXPLAIN.
+def observeQuery(cursor:ext.cursor, graphName:str, cypherStmt:str, stmt:str, explain) -> QueryEvent:
+    observers = _observers.get(cursor.connection)
+    if observers == None:
+        return None
+    event = QueryEvent(observers, cursor.connection, graphName, cypherStmt, stmt, explain)
+    if isinstance(cursor, ObservedCursor):
+        cursor.ageEvent = event
+        oid = _agtypeOids.get(cursor.connection)
+        if oid != None:
+            observeDecoding(cursor, oid, event)
+    return event.start()
+
+def queryExecuted(cursor:ext.cursor, event:QueryEvent):
+    if isinstance(cursor, ObservedCursor):
+        cursor._executed()
+    else:
+        event.executed()
+
+
 def execSql(conn:ext.connection, stmt:str, commit:bool=False, params:tuple=None) -> ext.cursor :
     if conn == None or conn.closed:
         raise _EXCEPTION_NoConnection
@@ -108,55 +333,277 @@ def querySql(conn:ext.connection, stmt:str, params:tuple=None) -> ext.cursor :
 # If cypher statement changes data (create, set, remove),
 # You must commit session(ag.commit())
 # (Otherwise the execution cannot make any effect.)
-def execCypher(conn:ext.connection, graphName:str, cypherStmt:str, cols:list=None, params:tuple=None) -> ext.cursor :
+# cypherParams is a dict of $name parameters. It is sent as an agtype map bound to
+# cypher()'s third argument, through the connection's prepared statement cache.
+# With stream, the result is read through a named server side cursor that fetches
+# itersize rows at a time, so the whole result is never held in client memory.
+# identityMap (an IdentityMap) dedupes vertices and edges across the rows of this query.
+def execCypher(conn:ext.connection, graphName:str, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None,
+               stream:bool=False, itersize:int=None, identityMap=None) -> ext.cursor :
     if conn == None or conn.closed:
         raise _EXCEPTION_NoConnection
 
-    cursor = conn.cursor()
+    if cypherParams != None:
+        if params != None:
+            raise ValueError("params and cypherParams can not be used together")
+        if stream:
+            # EXECUTE can not be the query of a DECLARE CURSOR.
+            raise ValueError("stream can not be used with cypherParams")
+        return execCypherPrepared(conn, statementCacheFor(conn), graphName, cypherStmt, cols=cols, params=cypherParams,
+                                  identityMap=identityMap)
+
+    cursor = newCursor(conn)
     #clean up the string for mogrification
     cypherStmt = cypherStmt.replace("\n", "")
     cypherStmt = cypherStmt.replace("\t", "")
     cypher = str(cursor.mogrify(cypherStmt, params))
     cypher = cypher[2:len(cypher)-1]
 
-    preparedStmt = "SELECT * FROM age_prepare_cypher({graphName},{cypherStmt})"
+    if stream:
+        # Named cursors need a transaction, or WITH HOLD in autocommit mode.
+        cursor = newCursor(conn, name="age_stream_" + str(next(_streamCursorSeq)), withhold=conn.autocommit)
+        if itersize != None:
+            cursor.itersize = itersize
+        stmt = buildInlineCypher(conn, graphName, cypher, cols)
+    else:
+        stmt = buildPreparedCypher(conn, graphName, cypher, cols)
 
-    cursor = conn.cursor()
+    if identityMap != None:
+        useIdentityMap(cursor, identityMap)
+
+    event = observeQuery(cursor, graphName, cypherStmt, stmt, lambda: buildInlineCypher(conn, graphName, cypher, cols))
     try:
-        cursor.execute(sql.SQL(preparedStmt).format(graphName=sql.Literal(graphName),cypherStmt=sql.Literal(cypher)))
+        cursor.execute(stmt)
     except SyntaxError as cause:
         conn.rollback()
+        if event != None:
+            event.fail(cause)
         raise cause
     except Exception as cause:
         conn.rollback()
-        raise SqlExecutionError("Execution ERR[" + str(cause) +"](" + preparedStmt +")", cause)
+        error = SqlExecutionError("Execution ERR[" + str(cause) +"](" + stmt +")", cause)
+        if event != None:
+            event.fail(error)
+        raise error
 
-    stmt = buildCypher(graphName, cypher, cols)
+    if event != None:
+        queryExecuted(cursor, event)
+    return cursor
 
-    cursor = conn.cursor()
+
+# Execute cypher statement through a server side prepared statement cached in 'cache'.
+# params is a dict that the statement sees as $name parameters.
+# Repeated (graphName, cypherStmt, cols) combinations only send EXECUTE and reuse the plan.
+def execCypherPrepared(conn:ext.connection, cache:StatementCache, graphName:str, cypherStmt:str, cols:list=None, params:dict=None,
+                       identityMap=None) -> ext.cursor :
+    if conn == None or conn.closed:
+        raise _EXCEPTION_NoConnection
+
+    prepareStmt, stmt, key = buildExecuteCypher(conn, cache, graphName, cypherStmt, cols, params)
+
+    cursor = newCursor(conn)
+    if identityMap != None:
+        useIdentityMap(cursor, identityMap)
+    event = observeQuery(cursor, graphName, cypherStmt, stmt, lambda: stmt)
     try:
+        if prepareStmt != None:
+            prepareCached(cursor, cache, key, prepareStmt)
         cursor.execute(stmt)
-        return cursor
     except SyntaxError as cause:
         conn.rollback()
+        if event != None:
+            event.fail(cause)
         raise cause
     except Exception as cause:
         conn.rollback()
-        raise SqlExecutionError("Execution ERR[" + str(cause) +"](" + stmt +")", cause)
-
+        error = SqlExecutionError("Execution ERR[" + str(cause) +"](" + stmt +")", cause)
+        if event != None:
+            event.fail(error)
+        raise error
+
+    if event != None:
+        queryExecuted(cursor, event)
+    return cursor
+
+
+def cypher(cursor:ext.cursor, graphName:str, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None) -> ext.cursor :
+    if cypherParams != None:
+        if params != None:
+            raise ValueError("params and cypherParams can not be used together")
+        cache = statementCacheFor(cursor.connection)
+        prepareStmt, stmt, key = buildExecuteCypher(cursor, cache, graphName, cypherStmt, cols, cypherParams)
+        event = observeQuery(cursor, graphName, cypherStmt, stmt, lambda: stmt)
+        try:
+            if prepareStmt != None:
+                prepareCached(cursor, cache, key, prepareStmt)
+            cursor.execute(stmt)
+        except Exception as cause:
+            if event != None:
+                event.fail(cause)
+            raise
+        if event != None:
+            queryExecuted(cursor, event)
+        return
 
-def cypher(cursor:ext.cursor, graphName:str, cypherStmt:str, cols:list=None, params:tuple=None) -> ext.cursor :
     #clean up the string for mogrification
     cypherStmt = cypherStmt.replace("\n", "")
     cypherStmt = cypherStmt.replace("\t", "")
     cypher = str(cursor.mogrify(cypherStmt, params))
     cypher = cypher[2:len(cypher)-1]
 
-    preparedStmt = "SELECT * FROM age_prepare_cypher({graphName},{cypherStmt})"
-    cursor.execute(sql.SQL(preparedStmt).format(graphName=sql.Literal(graphName),cypherStmt=sql.Literal(cypher)))
+    stmt = buildPreparedCypher(cursor, graphName, cypher, cols)
+    event = observeQuery(cursor, graphName, cypherStmt, stmt, lambda: buildInlineCypher(cursor, graphName, cypher, cols))
+    try:
+        cursor.execute(stmt)
+    except Exception as cause:
+        if event != None:
+            event.fail(cause)
+        raise
+    if event != None:
+        queryExecuted(cursor, event)
+
+
+class BatchResult:
+    def __init__(self, index:int, rows:int, rowcount:int=0, error:Exception=None) -> None:
+        self.index = index          # batch number
+        self.rows = rows            # input rows sent in the batch
+        self.rowcount = rowcount    # rows returned by the statement
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error == None
+
+    def __repr__(self) -> str:
+        return "BatchResult[" + str(self.index) + "](rows=" + str(self.rows) + ", rowcount=" + \
+            str(self.rowcount) + ", error=" + repr(self.error) + ")"
+
+# Execute cypherStmt for every row of rows, batchSize rows per round trip.
+# Each batch is sent as the agtype list parameter $rows and unwound on the server:
+#   UNWIND $rows AS row <cypherStmt>
+# so cypherStmt refers to the current row as 'row'.
+# Each batch runs in a savepoint, so a failing batch is rolled back alone. With stopOnError
+# the failure is raised (earlier batches stay in the transaction); otherwise it is recorded
+# in that batch's BatchResult and the remaining batches run.
+# Returns the list of BatchResult. You must commit.
+def execBatch(conn:ext.connection, graphName:str, cypherStmt:str, rows, batchSize:int=DEFAULT_BATCH_SIZE, cols:list=None, stopOnError:bool=True) -> list :
+    if conn == None or conn.closed:
+        raise _EXCEPTION_NoConnection
 
-    stmt = buildCypher(graphName, cypher, cols)
-    cursor.execute(stmt)
+    cache = statementCacheFor(conn)
+    unwindStmt = "UNWIND $rows AS row " + cypherStmt
+    # Outside a transaction block every batch commits or fails on its own.
+    useSavepoint = not conn.autocommit
+    savepoint = "SAVEPOINT " + BATCH_SAVEPOINT + ";"
+    release = ""
+
+    results = []
+    it = iter(rows)
+    with conn.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(it, batchSize))
+            if len(batch) == 0:
+                break
+
+            prepareStmt, stmt, key = buildExecuteCypher(conn, cache, graphName, unwindStmt, cols, {"rows": batch})
+            # The previous batch's savepoint is released in the same round trip, and the new
+            # savepoint is set before anything of this batch runs.
+            head = release + savepoint if useSavepoint else ""
+            try:
+                if prepareStmt != None:
+                    prepareCached(cursor, cache, key, head + prepareStmt)
+                    head = ""
+                cursor.execute(head + stmt)
+                results.append(BatchResult(len(results), len(batch), cursor.rowcount))
+                release = "RELEASE SAVEPOINT " + BATCH_SAVEPOINT + ";"
+            except Exception as cause:
+                if useSavepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT " + BATCH_SAVEPOINT + ";RELEASE SAVEPOINT " + BATCH_SAVEPOINT + ";")
+                release = ""
+                error = SqlExecutionError("Execution ERR[" + str(cause) +"](" + unwindStmt +")", cause)
+                if stopOnError:
+                    raise error
+                results.append(BatchResult(len(results), len(batch), 0, error))
+
+        if release != "":
+            cursor.execute(release)
+    return results
+
+
+# Execute cypher statement and read the result into a ColumnarResult.
+# With props, column 'column' must hold vertices or edges and their ids, labels and
+# the listed properties become columns; without props every result column does.
+# Rows arrive as agtype text, so no Vertex or Edge objects are built.
+def execCypherColumnar(conn:ext.connection, graphName:str, cypherStmt:str, props:list=None, cols:list=None, params:tuple=None,
+                       column:int=0, chunkSize:int=DEFAULT_COLUMNAR_CHUNK_SIZE) -> ColumnarResult:
+    if conn == None or conn.closed:
+        raise _EXCEPTION_NoConnection
+    oid = _agtypeOids.get(conn)
+    if oid == None:
+        raise AgeNotSet()
+
+    cursor = execCypher(conn, graphName, cypherStmt, cols=cols, params=params, stream=True, itersize=chunkSize)
+    registerRawAgtype(cursor, oid)
+    try:
+        return fetchColumnar(cursor, props=props, column=column, chunkSize=chunkSize, rawOid=oid)
+    finally:
+        cursor.close()
+
+
+# Execute cypher statement and write the result to 'out' (anything with write(str),
+# e.g. a file or socket.makefile('w')) as newline delimited JSON.
+# Rows are streamed as agtype text and written without building python objects:
+# type annotations are stripped and everything else is passed through.
+def execCypherNdjson(conn:ext.connection, graphName:str, cypherStmt:str, out, cols:list=None, params:tuple=None,
+                     rowFormat:str=ROW_OBJECT, chunkSize:int=DEFAULT_EXPORT_CHUNK_SIZE) -> int:
+    if conn == None or conn.closed:
+        raise _EXCEPTION_NoConnection
+    oid = _agtypeOids.get(conn)
+    if oid == None:
+        raise AgeNotSet()
+
+    cursor = execCypher(conn, graphName, cypherStmt, cols=cols, params=params, stream=True, itersize=chunkSize)
+    registerRawAgtype(cursor, oid)
+    try:
+        return exportNdjson(cursor, out, rawOid=oid, rowFormat=rowFormat, chunkSize=chunkSize)
+    finally:
+        cursor.close()
+
+
+# Execute cypher statement and decode the result rows in worker processes.
+# Rows are streamed from a server side cursor as agtype text, chunkSize rows at a time,
+# decoded on 'executor' (a ProcessPoolExecutor with 'workers' processes by default)
+# and yielded in order. Meant for large exports where decoding is the bottleneck.
+# The workers decode agtype columns with the jsonFastPath setting of the connection's
+# result handler; properties are always decoded. A result handler that is not an
+# AgtypeDecoder, or has an identity map, can not be used in the workers: ValueError.
+def execCypherParallel(conn:ext.connection, graphName:str, cypherStmt:str, cols:list=None, params:tuple=None,
+                       chunkSize:int=DEFAULT_PARALLEL_CHUNK_SIZE, workers:int=None, executor=None, prefetch:int=None):
+    if conn == None or conn.closed:
+        raise _EXCEPTION_NoConnection
+    oid = _agtypeOids.get(conn)
+    if oid == None:
+        raise AgeNotSet()
+    handler = _resultHandlers.get(conn)
+    if not isinstance(handler, AgtypeDecoder):
+        raise ValueError("Parallel decoding needs an AgtypeDecoder result handler, not " + type(handler).__name__)
+    if handler.vertexCache != None:
+        raise ValueError("Parallel decoding can not use an identity map")
+
+    cursor = execCypher(conn, graphName, cypherStmt, cols=cols, params=params, stream=True, itersize=chunkSize)
+    registerRawAgtype(cursor, oid)
+    if prefetch == None and workers != None:
+        prefetch = 2 * workers
+
+    def rows():
+        pool = executor if executor != None else ProcessPoolExecutor(workers)
+        try:
+            yield from iterDecoded(cursor, pool, oid, chunkSize=chunkSize, prefetch=prefetch, decoder=handler)
+        finally:
+            cursor.close()
+            if executor == None:
+                pool.shutdown(cancel_futures=True)
+    return rows()
 
 
 # def execCypherWithReturn(conn:ext.connection, graphName:str, cypherStmt:str, columns:list=None , params:tuple=None) -> ext.cursor :
@@ -168,37 +615,94 @@ def cypher(cursor:ext.cursor, graphName:str, cypherStmt:str, cols:list=None, par
 
 
 class Age:
-    def __init__(self):
+    def __init__(self, statementCacheSize:int=DEFAULT_STATEMENT_CACHE_SIZE):
         self.connection = None    # psycopg2 connection]
         self.graphName = None
+        self.statementCache = StatementCache(statementCacheSize)
 
     # Connect to PostgreSQL Server and establish session and type extension environment.
-    def connect(self, graph:str=None, dsn:str=None, connection_factory=None, cursor_factory=None, **kwargs):
+    # resultHandler decodes agtype results for this connection, e.g. AgtypeDecoder(lazyProperties=True).
+    def connect(self, graph:str=None, dsn:str=None, connection_factory=None, cursor_factory=None, resultHandler=None, **kwargs):
         conn = psycopg2.connect(dsn, connection_factory, cursor_factory, **kwargs)
-        setUpAge(conn, graph)
+        setUpAge(conn, graph, resultHandler)
         self.connection = conn
         self.graphName = graph
+        self.statementCache.clear()
+        _statementCaches[conn] = self.statementCache
         return self
 
     def close(self):
         self.connection.close()
+        self.statementCache.clear()
 
     def setGraph(self, graph:str):
         checkGraphCreated(self.connection, graph)
         self.graphName = graph
+        # Graph ids are only unique within a graph.
+        handler = resultHandlerFor(self.connection)
+        if getattr(handler, "vertexCache", None) != None:
+            handler.vertexCache.clear()
         return self
 
     def commit(self):
         self.connection.commit()
 
+    # Register a QueryObserver (e.g. LatencyHistogram) for the queries run through this connection.
+    def addObserver(self, observer:QueryObserver):
+        addObserver(self.connection, observer)
+        return self
+
+    def removeObserver(self, observer:QueryObserver):
+        removeObserver(self.connection, observer)
+        return self
+
     def rollback(self):
         self.connection.rollback()
 
-    def execCypher(self, cypherStmt:str, cols:list=None, params:tuple=None) -> ext.cursor :
-        return execCypher(self.connection, self.graphName, cypherStmt, cols=cols, params=params)
-
-    def cypher(self, cursor:ext.cursor, cypherStmt:str, cols:list=None, params:tuple=None) -> ext.cursor :
-        return cypher(cursor, self.graphName, cypherStmt, cols=cols, params=params)
+    def execCypher(self, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None,
+                   stream:bool=False, itersize:int=None, identityMap=None) -> ext.cursor :
+        return execCypher(self.connection, self.graphName, cypherStmt, cols=cols, params=params, cypherParams=cypherParams,
+                          stream=stream, itersize=itersize, identityMap=identityMap)
+
+    def cypher(self, cursor:ext.cursor, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None) -> ext.cursor :
+        return cypher(cursor, self.graphName, cypherStmt, cols=cols, params=params, cypherParams=cypherParams)
+
+    # Load vertices with COPY. rows is an iterable of property dicts. You must commit.
+    def bulkLoadVertices(self, label:str, rows) -> BulkLoadResult :
+        return bulkLoadVertices(self.connection, self.graphName, label, rows)
+
+    # Load edges with COPY. rows is an iterable of (start key, end key[, property dict]);
+    # startKey/endKey are (vertex label, property name) used to find the endpoints. You must commit.
+    def bulkLoadEdges(self, label:str, rows, startKey:tuple, endKey:tuple, batchSize:int=DEFAULT_EDGE_BATCH_SIZE) -> BulkLoadResult :
+        return bulkLoadEdges(self.connection, self.graphName, label, rows, startKey, endKey, batchSize=batchSize)
+
+    # Execute 'UNWIND $rows AS row <cypherStmt>' for rows, batchSize rows per round trip.
+    # Returns a BatchResult per batch. You must commit.
+    def execBatch(self, cypherStmt:str, rows, batchSize:int=DEFAULT_BATCH_SIZE, cols:list=None, stopOnError:bool=True) -> list :
+        return execBatch(self.connection, self.graphName, cypherStmt, rows, batchSize=batchSize, cols=cols, stopOnError=stopOnError)
+
+    # Execute cypher statement with $name parameters through the prepared statement cache.
+    def execCypherPrepared(self, cypherStmt:str, cols:list=None, params:dict=None, identityMap=None) -> ext.cursor :
+        return execCypherPrepared(self.connection, self.statementCache, self.graphName, cypherStmt, cols=cols, params=params,
+                                  identityMap=identityMap)
+
+    # Execute cypher statement and read the result into typed columns.
+    def execCypherColumnar(self, cypherStmt:str, props:list=None, cols:list=None, params:tuple=None, column:int=0,
+                           chunkSize:int=DEFAULT_COLUMNAR_CHUNK_SIZE) -> ColumnarResult:
+        return execCypherColumnar(self.connection, self.graphName, cypherStmt, props=props, cols=cols, params=params,
+                                  column=column, chunkSize=chunkSize)
+
+    # Execute cypher statement and write the result to 'out' as NDJSON. Returns the number of rows.
+    def execCypherNdjson(self, cypherStmt:str, out, cols:list=None, params:tuple=None, rowFormat:str=ROW_OBJECT,
+                         chunkSize:int=DEFAULT_EXPORT_CHUNK_SIZE) -> int:
+        return execCypherNdjson(self.connection, self.graphName, cypherStmt, out, cols=cols, params=params,
+                                rowFormat=rowFormat, chunkSize=chunkSize)
+
+    # Execute cypher statement and decode the rows in worker processes. Returns an iterator of rows in order.
+    def execCypherParallel(self, cypherStmt:str, cols:list=None, params:tuple=None, chunkSize:int=DEFAULT_PARALLEL_CHUNK_SIZE,
+                           workers:int=None, executor=None, prefetch:int=None):
+        return execCypherParallel(self.connection, self.graphName, cypherStmt, cols=cols, params=params, chunkSize=chunkSize,
+                                  workers=workers, executor=executor, prefetch=prefetch)
 
     # def execSql(self, stmt:str, commit:bool=False, params:tuple=None) -> ext.cursor :
     #     return execSql(self.connection, stmt, commit, params)
@@ -0,0 +1,213 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# asyncio driver on psycopg 3 (pip install psycopg).
+#
+#   ag = await age.aio.connect(graph="g", dsn="...")
+#   cursor = await ag.execCypher("MATCH (n {name: $name}) RETURN n", cypherParams={"name": "Andy"})
+#   async for row in cursor:
+#       ...
+
+try:
+    import psycopg
+    from psycopg import sql
+    from psycopg.adapt import Loader
+    from psycopg.pq import Format
+except ImportError:
+    psycopg = None
+
+from .exceptions import *
+from .builder import parseAgeValue
+from .decoder import AgtypeDecoder
+from .age import buildCypherColumns, buildCypherParams, dollarQuote
+
+_EXCEPTION_NoConnection = NoConnection()
+_EXCEPTION_GraphNotSet = GraphNotSet()
+
+_binaryDecoder = AgtypeDecoder(None)
+
+if psycopg != None:
+    class AgtypeLoader(Loader):
+        def __init__(self, oid, context=None):
+            super().__init__(oid, context)
+            self.encoding = self.connection.info.encoding if self.connection != None else 'utf-8'
+
+        def load(self, data):
+            return parseAgeValue(bytes(data).decode(self.encoding))
+
+    # agtype_send format, used by cursors created with binary=True.
+    class AgtypeBinaryLoader(Loader):
+        format = Format.BINARY
+
+        def load(self, data):
+            return _binaryDecoder.parseBinary(data)
+
+
+def _checkPsycopg():
+    if psycopg == None:
+        raise ImportError("age.aio requires psycopg 3: pip install psycopg")
+
+
+async def setUpAge(conn, graphName:str):
+    async with conn.cursor() as cursor:
+        await cursor.execute("LOAD 'age';")
+        await cursor.execute("SET search_path = ag_catalog, '$user', public;")
+
+        await cursor.execute("SELECT typelem FROM pg_type WHERE typname='_agtype'")
+        oid = (await cursor.fetchone())[0]
+        if oid == None :
+            raise AgeNotSet()
+
+        conn.adapters.register_loader(oid, AgtypeLoader)
+        conn.adapters.register_loader(oid, AgtypeBinaryLoader)
+
+    # Check graph exists
+    if graphName != None:
+        await checkGraphCreated(conn, graphName)
+    await conn.commit()
+
+# Create the graph, if it does not exist
+async def checkGraphCreated(conn, graphName:str):
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT count(*) FROM ag_graph WHERE name=%s", (graphName,))
+        if (await cursor.fetchone())[0] == 0:
+            await cursor.execute("SELECT create_graph(%s);", (graphName,))
+            await conn.commit()
+
+
+async def deleteGraph(conn, graphName:str):
+    async with conn.cursor() as cursor:
+        await cursor.execute("SELECT drop_graph(%s, true);", (graphName,))
+        await conn.commit()
+
+
+# One SELECT over cypher(). psycopg 3 binds parameters server side, so with
+# hasParams the agtype map is a real $1 parameter as cypher() requires, and
+# psycopg prepares statements that are executed repeatedly.
+def buildCypher(conn, graphName:str, cypherStmt:str, columns:list, hasParams:bool) ->str:
+    if graphName == None:
+        raise _EXCEPTION_GraphNotSet
+
+    stmtArr = []
+    stmtArr.append("SELECT * from cypher(")
+    stmtArr.append(sql.Literal(graphName).as_string(conn))
+    stmtArr.append(", ")
+    if hasParams:
+        # '%' in the query would be taken for a placeholder.
+        stmtArr.append(dollarQuote(cypherStmt).replace("%", "%%"))
+        stmtArr.append(", %s")
+    else:
+        stmtArr.append(dollarQuote(cypherStmt))
+    stmtArr.append(") as (")
+    stmtArr.append(buildCypherColumns(columns))
+    stmtArr.append(");")
+    return "".join(stmtArr)
+
+
+# Builds the statement and its parameters, splicing tuple params into the query
+# the way the psycopg2 driver does.
+async def _prepareCypher(conn, graphName:str, cypherStmt:str, cols:list, params:tuple, cypherParams:dict):
+    if cypherParams != None:
+        if params != None:
+            raise ValueError("params and cypherParams can not be used together")
+        return buildCypher(conn, graphName, cypherStmt, cols, True), (buildCypherParams(cypherParams),)
+
+    if params != None:
+        #clean up the string for mogrification
+        cypherStmt = cypherStmt.replace("\n", "")
+        cypherStmt = cypherStmt.replace("\t", "")
+        async with psycopg.AsyncClientCursor(conn) as cursor:
+            cypherStmt = cursor.mogrify(cypherStmt, params)
+    return buildCypher(conn, graphName, cypherStmt, cols, False), None
+
+
+# Execute cypher statement and return cursor.
+# If cypher statement changes data (create, set, remove),
+# You must commit session(await ag.commit())
+async def execCypher(conn, graphName:str, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None, binary:bool=False):
+    if conn == None or conn.closed:
+        raise _EXCEPTION_NoConnection
+
+    stmt, args = await _prepareCypher(conn, graphName, cypherStmt, cols, params, cypherParams)
+
+    cursor = conn.cursor(binary=binary)
+    try:
+        await cursor.execute(stmt, args)
+        return cursor
+    except SyntaxError as cause:
+        await conn.rollback()
+        raise cause
+    except Exception as cause:
+        await conn.rollback()
+        raise SqlExecutionError("Execution ERR[" + str(cause) +"](" + stmt +")", cause)
+
+
+async def cypher(cursor, graphName:str, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None):
+    stmt, args = await _prepareCypher(cursor.connection, graphName, cypherStmt, cols, params, cypherParams)
+    await cursor.execute(stmt, args)
+    return cursor
+
+
+class AsyncAge:
+    def __init__(self):
+        self.connection = None    # psycopg AsyncConnection
+        self.graphName = None
+
+    # Connect to PostgreSQL Server and establish session and type extension environment.
+    async def connect(self, graph:str=None, dsn:str=None, **kwargs):
+        _checkPsycopg()
+        conn = await psycopg.AsyncConnection.connect(dsn if dsn != None else "", **kwargs)
+        try:
+            await setUpAge(conn, graph)
+        except Exception:
+            await conn.close()
+            raise
+        self.connection = conn
+        self.graphName = graph
+        return self
+
+    async def close(self):
+        await self.connection.close()
+
+    async def setGraph(self, graph:str):
+        await checkGraphCreated(self.connection, graph)
+        self.graphName = graph
+        return self
+
+    async def commit(self):
+        await self.connection.commit()
+
+    async def rollback(self):
+        await self.connection.rollback()
+
+    # Returns a psycopg AsyncCursor; iterate it with 'async for'.
+    async def execCypher(self, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None, binary:bool=False):
+        return await execCypher(self.connection, self.graphName, cypherStmt, cols=cols, params=params,
+                                cypherParams=cypherParams, binary=binary)
+
+    async def cypher(self, cursor, cypherStmt:str, cols:list=None, params:tuple=None, cypherParams:dict=None):
+        return await cypher(cursor, self.graphName, cypherStmt, cols=cols, params=params, cypherParams=cypherParams)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, excType, exc, tb):
+        await self.close()
+
+
+async def connect(dsn=None, graph=None, **kwargs) -> AsyncAge:
+    ag = AsyncAge()
+    await ag.connect(dsn=dsn, graph=graph, **kwargs)
+    return ag
@@ -18,31 +18,49 @@ from .gen.AgtypeParser import AgtypeParser
 from .gen.AgtypeVisitor import AgtypeVisitor
 from .models import *
 from .exceptions import *
+from .decoder import AgtypeDecoder
 from antlr4 import *
 from antlr4.tree.Tree import *
 from decimal import Decimal
+import threading
 
-resultHandler = None
+# Decoders used by parseAgeValue, one per thread.
+_threadHandlers = threading.local()
 
 class ResultHandler:
     def parse(ageData):
         pass
 
 def newResultHandler(query=""):
-    resultHandler = Antlr4ResultHandler(None, query)
+    resultHandler = AgtypeDecoder(None)
     return resultHandler
 
-def parseAgeValue(value, cursor=None):
+# Decoder of the calling thread, created on first use.
+def threadResultHandler():
+    handler = getattr(_threadHandlers, "handler", None)
+    if handler == None:
+        handler = _threadHandlers.handler = newResultHandler()
+    return handler
+
+def decodeAgeValue(handler, value):
     if value is None:
         return None
-
-    global resultHandler
-    if (resultHandler == None):
-        resultHandler = Antlr4ResultHandler(None)
     try:
-        return resultHandler.parse(value)
+        return handler.parse(value)
+    except AGTypeError:
+        raise
     except Exception as ex:
-        raise AGTypeError(value)
+        raise AGTypeError(value, ex)
+
+def parseAgeValue(value, cursor=None):
+    return decodeAgeValue(threadResultHandler(), value)
+
+# psycopg2 typecaster function bound to one result handler.
+# setUpAge registers one per connection so no decoder state is shared between connections.
+def newAgeTypecaster(handler):
+    def castAgeValue(value, cursor):
+        return decodeAgeValue(handler, value)
+    return castAgeValue
 
 
 class Antlr4ResultHandler(ResultHandler):
@@ -0,0 +1,219 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import time
+from psycopg2 import extensions as ext
+from psycopg2 import sql
+from .exceptions import *
+from .encoder import toAgtype
+
+LABEL_KIND_VERTEX = 'v'
+LABEL_KIND_EDGE = 'e'
+
+COPY_BUFFER_SIZE = 65536
+DEFAULT_EDGE_BATCH_SIZE = 10000
+
+
+class BulkLoadResult:
+    def __init__(self, label:str, rows:int, seconds:float) -> None:
+        self.label = label
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rowsPerSecond(self) -> float:
+        if self.seconds <= 0:
+            return float(self.rows)
+        return self.rows / self.seconds
+
+    def add(self, other):
+        self.rows += other.rows
+        self.seconds += other.seconds
+
+    def __repr__(self) -> str:
+        return "BulkLoadResult[" + self.label + "](rows=" + str(self.rows) + ", seconds=" + \
+            format(self.seconds, ".3f") + ", rowsPerSecond=" + format(self.rowsPerSecond, ".1f") + ")"
+
+
+# File-like object feeding COPY FROM STDIN from an iterator of text lines,
+# so rows are produced only as fast as psycopg2 sends them.
+class CopyStream:
+    def __init__(self, lines) -> None:
+        self.lines = iter(lines)
+        self.rows = 0
+
+    def read(self, size:int=-1) -> str:
+        if size < 0:
+            size = COPY_BUFFER_SIZE
+        buf = []
+        length = 0
+        for line in self.lines:
+            buf.append(line)
+            length += len(line)
+            self.rows += 1
+            if length >= size:
+                break
+        return "".join(buf)
+
+
+# agtype text of a property map, escaped for the COPY text format.
+# toAgtype never emits raw control characters, so only backslashes need escaping.
+def copyProperties(properties:dict) -> str:
+    if properties == None:
+        return "{}"
+    if not isinstance(properties, dict):
+        raise TypeError("properties must be a dict, not " + type(properties).__name__)
+    return toAgtype(properties).replace("\\", "\\\\")
+
+
+# Create the label if it does not exist yet.
+def checkLabelCreated(conn:ext.connection, graphName:str, label:str, kind:str):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT l.kind FROM ag_label l JOIN ag_graph g ON l.graph = g.graphid "
+                       "WHERE g.name = %s AND l.name = %s", (graphName, label))
+        row = cursor.fetchone()
+        if row == None:
+            func = "create_vlabel" if kind == LABEL_KIND_VERTEX else "create_elabel"
+            cursor.execute(sql.SQL("SELECT {func}({graphName}, {label});").format(
+                func=sql.SQL(func), graphName=sql.Literal(graphName), label=sql.Literal(label)))
+        elif row[0] != kind:
+            raise ValueError("Label[" + label + "] already exists with kind '" + row[0] + "'")
+
+
+def copyRows(conn:ext.connection, graphName:str, label:str, columns:list, lines) -> BulkLoadResult:
+    stmt = sql.SQL("COPY {table} ({columns}) FROM STDIN").format(
+        table=sql.Identifier(graphName, label),
+        columns=sql.SQL(", ").join(sql.Identifier(c) for c in columns))
+
+    stream = CopyStream(lines)
+    start = time.perf_counter()
+    with conn.cursor() as cursor:
+        try:
+            cursor.copy_expert(stmt, stream, COPY_BUFFER_SIZE)
+        except Exception as cause:
+            conn.rollback()
+            raise SqlExecutionError("Execution ERR[" + str(cause) + "](" + stmt.as_string(conn) + ")", cause)
+    return BulkLoadResult(label, stream.rows, time.perf_counter() - start)
+
+
+# Text ->> returns for a property value, used to match lookup results to keys.
+def keyText(value) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+# Resolve property values to vertex graph ids with one query.
+# Each value is matched with a containment test, properties @> {prop: value}, joined
+# against the values of the batch, so a GIN index on the label's properties serves
+# every lookup. Without such an index each call scans the whole label table.
+# Returns {key text: graph id text}.
+def resolveVertexIds(conn:ext.connection, graphName:str, label:str, prop:str, values) -> dict:
+    probes = dict((keyText(value), toAgtype({prop: value})) for value in values)
+    stmt = sql.SQL("SELECT k.key, t.id FROM unnest(%s::text[], %s::text[]) AS k(key, probe) "
+                   "JOIN {table} AS t ON t.properties @> k.probe::agtype").format(table=sql.Identifier(graphName, label))
+
+    ids = dict()
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(stmt, (list(probes.keys()), list(probes.values())))
+        except Exception as cause:
+            conn.rollback()
+            raise SqlExecutionError("Execution ERR[" + str(cause) + "](" + stmt.as_string(conn) + ")", cause)
+
+        for key, gid in cursor:
+            if key in ids and ids[key] != gid:
+                raise ValueError("Vertex key " + label + "." + prop + "=" + key + " is not unique")
+            ids[key] = gid
+    return ids
+
+
+def resolveEdgeBatch(conn:ext.connection, graphName:str, batch:list, startKey:tuple, endKey:tuple) -> list:
+    startValues = [row[0] for row in batch]
+    endValues = [row[1] for row in batch]
+    if startKey == endKey:
+        startIds = endIds = resolveVertexIds(conn, graphName, startKey[0], startKey[1], startValues + endValues)
+    else:
+        startIds = resolveVertexIds(conn, graphName, startKey[0], startKey[1], startValues)
+        endIds = resolveVertexIds(conn, graphName, endKey[0], endKey[1], endValues)
+
+    lines = []
+    for row in batch:
+        start = startIds.get(keyText(row[0]))
+        if start == None:
+            raise ValueError("Start vertex " + startKey[0] + "." + startKey[1] + "=" + keyText(row[0]) + " not found")
+        end = endIds.get(keyText(row[1]))
+        if end == None:
+            raise ValueError("End vertex " + endKey[0] + "." + endKey[1] + "=" + keyText(row[1]) + " not found")
+        props = row[2] if len(row) > 2 else None
+        lines.append(start + "\t" + end + "\t" + copyProperties(props) + "\n")
+    return lines
+
+
+# Load vertices into 'label' with COPY. 'rows' is an iterable of property dicts
+# and may be a generator; rows are streamed, not collected.
+# Graph ids come from the label's id sequence, as with CREATE.
+# The caller must commit.
+def bulkLoadVertices(conn:ext.connection, graphName:str, label:str, rows) -> BulkLoadResult:
+    if conn == None or conn.closed:
+        raise NoConnection()
+    if graphName == None:
+        raise GraphNotSet()
+
+    checkLabelCreated(conn, graphName, label, LABEL_KIND_VERTEX)
+    lines = (copyProperties(props) + "\n" for props in rows)
+    return copyRows(conn, graphName, label, ["properties"], lines)
+
+
+# Load edges into 'label' with COPY.
+# 'rows' is an iterable of (start key value, end key value[, property dict]) tuples.
+# Endpoints are looked up by the (vertex label, property name) pairs in
+# startKey and endKey, once per batch of batchSize rows, and each batch is
+# then copied into the edge label table. The caller must commit.
+# Create a GIN index on the properties of the endpoint labels first, e.g.
+# CREATE INDEX ON graph."Person" USING gin (properties); without it every
+# batch scans the whole label table.
+def bulkLoadEdges(conn:ext.connection, graphName:str, label:str, rows, startKey:tuple, endKey:tuple,
+                  batchSize:int=DEFAULT_EDGE_BATCH_SIZE) -> BulkLoadResult:
+    if conn == None or conn.closed:
+        raise NoConnection()
+    if graphName == None:
+        raise GraphNotSet()
+
+    checkLabelCreated(conn, graphName, label, LABEL_KIND_EDGE)
+
+    result = BulkLoadResult(label, 0, 0.0)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batchSize:
+            result.add(loadEdgeBatch(conn, graphName, label, batch, startKey, endKey))
+            batch = []
+    if len(batch) > 0:
+        result.add(loadEdgeBatch(conn, graphName, label, batch, startKey, endKey))
+    return result
+
+
+def loadEdgeBatch(conn:ext.connection, graphName:str, label:str, batch:list, startKey:tuple, endKey:tuple) -> BulkLoadResult:
+    start = time.perf_counter()
+    try:
+        lines = resolveEdgeBatch(conn, graphName, batch, startKey, endKey)
+    except ValueError:
+        conn.rollback()
+        raise
+    result = copyRows(conn, graphName, label, ["start_id", "end_id", "properties"], lines)
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,139 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from collections import OrderedDict
+
+DEFAULT_STATEMENT_CACHE_SIZE = 128
+
+
+class StatementCache:
+    """LRU bookkeeping for server side prepared cypher statements.
+
+    Maps a (graph, cypher, columns) key to the name of the statement
+    PREPAREd for it on one connection. The cache does not talk to the
+    server itself: put() returns the names the caller has to DEALLOCATE.
+    """
+
+    def __init__(self, maxSize:int=DEFAULT_STATEMENT_CACHE_SIZE, prefix:str="age_stmt_"):
+        if maxSize < 1:
+            raise ValueError("maxSize must be at least 1")
+        self.maxSize = maxSize
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._statements = OrderedDict()
+        self._seq = 0
+
+    def __len__(self):
+        return self._statements.__len__()
+
+    def __contains__(self, key):
+        return key in self._statements
+
+    # Return the statement name for key, or None on a miss.
+    def get(self, key):
+        name = self._statements.get(key)
+        if name is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._statements.move_to_end(key)
+        return name
+
+    # Register a new statement for key.
+    # Returns (name, evicted names) - the evicted statements must be deallocated.
+    def put(self, key):
+        self._seq += 1
+        name = self.prefix + str(self._seq)
+        self._statements[key] = name
+        self._statements.move_to_end(key)
+
+        evicted = []
+        while len(self._statements) > self.maxSize:
+            evicted.append(self._statements.popitem(last=False)[1])
+            self.evictions += 1
+        return name, evicted
+
+    # Forget key, e.g. when preparing it failed.
+    def discard(self, key):
+        return self._statements.pop(key, None)
+
+    # Forget every statement, e.g. after the session was reset.
+    def clear(self):
+        self._statements.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._statements), "maxSize": self.maxSize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+DEFAULT_IDENTITY_MAP_SIZE = 100000
+
+
+class IdentityMap:
+    """Bounded LRU of decoded Vertex and Edge objects keyed by graph id.
+
+    Used as the decoder's vertexCache so an entity that appears in many rows
+    or paths is built once and the same object is returned each time. The map
+    may outlive a query: an entity read again is updated in place with the
+    label and properties just read. Graph ids are unique within one graph
+    only, so use one map per graph. Not thread-safe: use one map per
+    connection, cursor or thread.
+    """
+
+    def __init__(self, maxSize:int=DEFAULT_IDENTITY_MAP_SIZE):
+        if maxSize != None and maxSize < 1:
+            raise ValueError("maxSize must be at least 1")
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entities = OrderedDict()
+
+    def __len__(self):
+        return self._entities.__len__()
+
+    def __contains__(self, gid):
+        return gid in self._entities
+
+    def __getitem__(self, gid):
+        return self._entities[gid]
+
+    def __setitem__(self, gid, entity):
+        self.put(gid, entity)
+
+    def get(self, gid, default=None):
+        entity = self._entities.get(gid)
+        if entity is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entities.move_to_end(gid)
+        return entity
+
+    def put(self, gid, entity):
+        entities = self._entities
+        entities[gid] = entity
+        if self.maxSize != None and len(entities) > self.maxSize:
+            entities.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entities.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entities), "maxSize": self.maxSize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,421 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Columnar results: typed buffers (array.array) with validity masks, in the
+# layout NumPy and Arrow use. Vertex and Edge objects are not built; raw agtype
+# text is scanned for the id, label and wanted properties of each entity only.
+
+import re
+from array import array
+from json.decoder import scanstring
+from .models import Vertex, Edge
+from .decoder import AgtypeDecoder
+from .exceptions import AGTypeError
+from .parallel import rawAgtypeColumns
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+KIND_INT = 'int'
+KIND_FLOAT = 'float'
+KIND_OBJECT = 'object'
+
+DEFAULT_COLUMNAR_CHUNK_SIZE = 10000
+
+# Largest integer a float64 column holds exactly.
+MAX_EXACT_FLOAT_INT = 2 ** 53
+
+_decoder = AgtypeDecoder(None)
+
+# Raw entity scanning: a member key up to its opening quote, the ':' after it,
+# the ',' or '}' after a value, and the delimiters of nested values.
+KEY_RE = re.compile(r'[ \t\n\r]*"')
+COLON_RE = re.compile(r'[ \t\n\r]*:[ \t\n\r]*')
+SEPARATOR_RE = re.compile(r'[ \t\n\r]*([,}])')
+STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+SCALAR_RE = re.compile(r'[^,}\] \t\n\r]+')
+NESTED_RE = re.compile(r'[\[\]{}"]')
+ANNOTATION_RE = re.compile(r'::[A-Z_a-z][$0-9A-Z_a-z]*')
+# A whole member with a key without escapes and a string or scalar value, and the ',' or '}' after it.
+SIMPLE_MEMBER_RE = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*'
+                              r'("[^"\\]*(?:\\.[^"\\]*)*"(?:::[A-Z_a-z][$0-9A-Z_a-z]*)?|[^,}\[\]{" \t\n\r]+)'
+                              r'[ \t\n\r]*([,}])', re.S)
+
+
+class Column:
+    """One typed column.
+
+    values is array('q') for int64, array('d') for float64 or a list for any
+    other python value. valid holds 1 for a value and 0 for null; null slots
+    in values hold 0, 0.0 or None. A column starts as int64 and is widened to
+    float64 or object when a value does not fit.
+    """
+    __slots__ = ('name', 'kind', 'values', 'valid')
+
+    def __init__(self, name:str) -> None:
+        self.name = name
+        self.kind = KIND_INT
+        self.values = array('q')
+        self.valid = bytearray()
+
+    def __len__(self):
+        return self.valid.__len__()
+
+    def append(self, value):
+        if value is None:
+            self.valid.append(0)
+            self.values.append(None if self.kind == KIND_OBJECT else 0)
+            return
+
+        cls = value.__class__
+        kind = self.kind
+        if kind == KIND_INT:
+            if cls is int:
+                try:
+                    self.values.append(value)
+                except OverflowError:
+                    self._widen(KIND_OBJECT)
+                    self.values.append(value)
+            elif cls is float:
+                self._widen(KIND_FLOAT if self._fitsFloat() else KIND_OBJECT)
+                self.values.append(value)
+            else:
+                self._widen(KIND_OBJECT)
+                self.values.append(value)
+        elif kind == KIND_FLOAT:
+            if cls is float or (cls is int and -MAX_EXACT_FLOAT_INT <= value <= MAX_EXACT_FLOAT_INT):
+                self.values.append(value)
+            else:
+                self._widen(KIND_OBJECT)
+                self.values.append(value)
+        else:
+            self.values.append(value)
+        self.valid.append(1)
+
+    def _fitsFloat(self) -> bool:
+        return all(-MAX_EXACT_FLOAT_INT <= v <= MAX_EXACT_FLOAT_INT for v in self.values)
+
+    def _widen(self, kind:str):
+        if kind == KIND_FLOAT:
+            self.values = array('d', self.values)
+        else:
+            self.values = [v if ok else None for v, ok in zip(self.values, self.valid)]
+        self.kind = kind
+
+    def nullCount(self) -> int:
+        return len(self.valid) - sum(self.valid)
+
+    def toList(self) -> list:
+        return [v if ok else None for v, ok in zip(self.values, self.valid)]
+
+    # numpy array, or a masked array when the column has nulls.
+    def toNumpy(self):
+        _checkNumpy()
+        if self.kind == KIND_INT:
+            data = numpy.frombuffer(self.values, dtype=numpy.int64)
+        elif self.kind == KIND_FLOAT:
+            data = numpy.frombuffer(self.values, dtype=numpy.float64)
+        else:
+            data = numpy.array(self.values, dtype=object)
+        if self.nullCount() == 0:
+            return data
+        mask = numpy.frombuffer(self.valid, dtype=numpy.uint8) == 0
+        return numpy.ma.masked_array(data, mask=mask)
+
+
+class CategoricalColumn:
+    """Strings stored as int32 codes into 'categories'; null is -1."""
+    __slots__ = ('name', 'codes', 'categories', '_index')
+
+    def __init__(self, name:str) -> None:
+        self.name = name
+        self.codes = array('i')
+        self.categories = []
+        self._index = dict()
+
+    def __len__(self):
+        return self.codes.__len__()
+
+    def append(self, value:str):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def toList(self) -> list:
+        categories = self.categories
+        return [categories[c] if c >= 0 else None for c in self.codes]
+
+    def toNumpy(self):
+        _checkNumpy()
+        return numpy.frombuffer(self.codes, dtype=numpy.int32)
+
+
+class ColumnarResult:
+    """Result rows as columns.
+
+    With props, one vertex or edge column of the result is read into ids,
+    labels, startIds/endIds (null for vertices) and one Column per property.
+    Without props, every result column becomes a Column in 'columns'.
+
+    raw tells which str values are undecoded agtype text to be parsed, the
+    others are decoded strings kept as they are. With props it is one flag for
+    the entity column, without props a list with a flag per column or one
+    flag for all of them.
+    """
+
+    def __init__(self, props:list=None, names:list=None, raw=False) -> None:
+        self.props = props
+        self.raw = raw
+        self.ids = None
+        self.labels = None
+        self.startIds = None
+        self.endIds = None
+        self.columns = dict()
+        self.rows = 0
+        if props != None:
+            self.ids = Column("id")
+            self.labels = CategoricalColumn("label")
+            self.startIds = Column("start_id")
+            self.endIds = Column("end_id")
+            for prop in props:
+                self.columns[prop] = Column(prop)
+        elif names != None:
+            for name in names:
+                self.columns[name] = Column(name)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def addEntity(self, value):
+        if value is None:
+            self.ids.append(None)
+            self.labels.append(None)
+            self.startIds.append(None)
+            self.endIds.append(None)
+            for column in self.columns.values():
+                column.append(None)
+        elif self.raw and value.__class__ is str:
+            self._scanEntity(value)
+        elif isinstance(value, (Vertex, Edge)):
+            self.ids.append(value.id)
+            self.labels.append(value.label)
+            if isinstance(value, Edge):
+                self.startIds.append(value.start_id)
+                self.endIds.append(value.end_id)
+            else:
+                self.startIds.append(None)
+                self.endIds.append(None)
+            properties = value.properties
+            for prop, column in self.columns.items():
+                column.append(properties.get(prop))
+        else:
+            raise TypeError("Expected a vertex or edge, not " + type(value).__name__)
+        self.rows += 1
+
+    def addValues(self, row):
+        raw = self.raw
+        if raw is True:
+            raw = [True] * len(self.columns)
+        if raw:
+            parse = _decoder.parse
+            for column, value, isRaw in zip(self.columns.values(), row, raw):
+                if isRaw and value.__class__ is str:
+                    value = parse(value)
+                column.append(value)
+        else:
+            for column, value in zip(self.columns.values(), row):
+                column.append(value)
+        self.rows += 1
+
+    # Append raw vertex or edge text. Only the id, label, start_id, end_id and the
+    # wanted properties are decoded, straight into their columns.
+    def _scanEntity(self, s:str):
+        if s.endswith("::vertex"):
+            isEdge = False
+        elif s.endswith("::edge"):
+            isEdge = True
+        else:
+            raise TypeError("Expected a vertex or edge, not: " + s[:64])
+
+        rows = self.rows
+        startId = endId = None
+        idx = _skipWhitespace(s, 0)
+        for key, start, idx in _members(s, idx):
+            if key == "properties":
+                if s.startswith('{', start):
+                    self._scanProperties(s, start)
+            elif key == "id":
+                self.ids.append(int(s[start:idx]))
+            elif key == "label":
+                self.labels.append(scanstring(s, start + 1, True)[0])
+            elif key == "start_id":
+                startId = int(s[start:idx])
+            elif key == "end_id":
+                endId = int(s[start:idx])
+        if len(self.ids) == rows or len(self.labels) == rows:
+            raise AGTypeError("Entity without id or label: " + s[:64], None)
+        self.startIds.append(startId if isEdge else None)
+        self.endIds.append(endId if isEdge else None)
+        # Wanted properties the entity does not have.
+        for column in self.columns.values():
+            if len(column) == rows:
+                column.append(None)
+
+    def _scanProperties(self, s:str, idx:int):
+        columns = self.columns
+        rows = self.rows
+        parse = _decoder.parse
+        for key, start, end in _members(s, idx):
+            column = columns.get(key)
+            if column != None and len(column) == rows:
+                column.append(parse(s[start:end]))
+
+    def toPydict(self) -> dict:
+        return dict((name, column.toList()) for name, column in self._allColumns())
+
+    def toNumpy(self) -> dict:
+        return dict((name, column.toNumpy()) for name, column in self._allColumns())
+
+    def _allColumns(self):
+        if self.props != None:
+            yield "id", self.ids
+            yield "label", self.labels
+            if self.startIds.nullCount() < len(self.startIds):
+                yield "start_id", self.startIds
+                yield "end_id", self.endIds
+        for item in self.columns.items():
+            yield item
+
+
+def _checkNumpy():
+    if numpy == None:
+        raise ImportError("toNumpy requires numpy: pip install numpy")
+
+
+def _skipWhitespace(s:str, idx:int) -> int:
+    while s[idx:idx + 1] in (' ', '\t', '\n', '\r'):
+        idx += 1
+    return idx
+
+
+# End index of the agtype value starting at s[idx], type annotation included.
+def _skipValue(s:str, idx:int) -> int:
+    c = s[idx:idx + 1]
+    if c == '"':
+        m = STRING_RE.match(s, idx)
+    elif c == '{' or c == '[':
+        m = None
+        depth = 0
+        pos = idx
+        while True:
+            d = NESTED_RE.search(s, pos)
+            if d == None:
+                break
+            c = d.group()
+            pos = d.end()
+            if c == '"':
+                d = STRING_RE.match(s, pos - 1)
+                if d == None:
+                    break
+                pos = d.end()
+            elif c == '{' or c == '[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    m = d
+                    break
+    else:
+        m = SCALAR_RE.match(s, idx)
+    if m == None:
+        raise AGTypeError("Agtype decode ERR[Unterminated value at position " + str(idx) + "](" + s + ")", None)
+    end = m.end()
+    a = ANNOTATION_RE.match(s, end)
+    return a.end() if a != None else end
+
+
+# (key, value start, value end) of each member of the object at s[idx] == '{'.
+def _members(s:str, idx:int):
+    if s[idx:idx + 1] != '{':
+        raise AGTypeError("Agtype decode ERR[Expecting object at position " + str(idx) + "](" + s + ")", None)
+    idx = _skipWhitespace(s, idx + 1)
+    if s.startswith('}', idx):
+        return
+    matchSimple = SIMPLE_MEMBER_RE.match
+    while True:
+        m = matchSimple(s, idx)
+        if m != None:
+            yield m.group(1), m.start(2), m.end(2)
+            if m.group(3) == '}':
+                return
+            idx = m.end()
+            continue
+
+        m = KEY_RE.match(s, idx)
+        if m == None:
+            raise AGTypeError("Agtype decode ERR[Expecting property name at position " + str(idx) + "](" + s + ")", None)
+        key, idx = scanstring(s, m.end(), True)
+        m = COLON_RE.match(s, idx)
+        if m == None:
+            raise AGTypeError("Agtype decode ERR[Expecting ':' delimiter at position " + str(idx) + "](" + s + ")", None)
+        start = m.end()
+        end = _skipValue(s, start)
+        yield key, start, end
+        m = SEPARATOR_RE.match(s, end)
+        if m == None:
+            raise AGTypeError("Agtype decode ERR[Expecting ',' delimiter at position " + str(end) + "](" + s + ")", None)
+        if m.group(1) == '}':
+            return
+        idx = m.end()
+
+
+# Read the remaining rows of 'cursor' into a ColumnarResult.
+# With rawOid, columns of that type hold raw agtype text (see age.parallel.registerRawAgtype);
+# other columns, and all columns without rawOid, hold decoded values.
+def fetchColumnar(cursor, props:list=None, column:int=0, chunkSize:int=DEFAULT_COLUMNAR_CHUNK_SIZE,
+                  rawOid:int=None) -> ColumnarResult:
+    result = None
+    while True:
+        rows = cursor.fetchmany(chunkSize)
+        if len(rows) == 0:
+            break
+        if result == None:
+            # Named cursors only have a description after the first fetch.
+            raw = rawAgtypeColumns(cursor, rawOid) if rawOid != None else False
+            if props != None:
+                result = ColumnarResult(props, raw=raw and raw[column])
+            else:
+                result = ColumnarResult(names=[d[0] for d in cursor.description], raw=raw)
+        if props != None:
+            addEntity = result.addEntity
+            for row in rows:
+                addEntity(row[column])
+        else:
+            addValues = result.addValues
+            for row in rows:
+                addValues(row)
+    if result == None:
+        result = ColumnarResult(props)
+    return result
@@ -0,0 +1,316 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import re
+import json
+from decimal import Decimal
+from json.decoder import scanstring
+from .models import *
+from .exceptions import *
+
+# Single pass agtype decoder.
+# Covers the whole Agtype.g4 grammar (JSON values, NaN/Infinity/-Infinity
+# and '::ident' type annotations) without building a token list or parse tree.
+
+NUMBER_RE = re.compile(r'(-?(?:0|[1-9][0-9]*))(\.[0-9]+)?([eE][-+]?[0-9]+)?')
+WS_RE = re.compile(r'[ \t\n\r]*')
+IDENT_RE = re.compile(r'[A-Z_a-z][$0-9A-Z_a-z]*')
+WS = ' \t\n\r'
+# Delimiters that matter when skipping over an object without decoding it.
+SKIP_RE = re.compile(r'[{}"]')
+STRING_TAIL_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+# agtype_send/agtype_recv wire format: one version byte followed by the
+# agtype text. Version 1 is the only one the server produces.
+BINARY_VERSION = 1
+
+# Same values visitFloatLiteral produces for the non-JSON float literals.
+FLOAT_CONSTANTS = {'NaN': float('nan'), 'Infinity': float('inf'), '-Infinity': float('-inf')}
+
+
+def _error(msg, s, idx):
+    return AGTypeError("Agtype decode ERR[" + msg + " at position " + str(idx) + "](" + s + ")", None)
+
+
+# End index of the object starting at s[idx] == '{'.
+def _skipObject(s, idx):
+    findDelimiter = SKIP_RE.search
+    matchStringTail = STRING_TAIL_RE.match
+    depth = 0
+    while True:
+        m = findDelimiter(s, idx)
+        if m is None:
+            raise _error("Unterminated object", s, idx)
+        c = m.group()
+        idx = m.end()
+        if c == '"':
+            m = matchStringTail(s, idx)
+            if m is None:
+                raise _error("Unterminated string", s, idx)
+            idx = m.end()
+        elif c == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return idx
+
+
+def _makeScanner(decoder):
+    matchNumber = NUMBER_RE.match
+    matchWs = WS_RE.match
+    matchIdent = IDENT_RE.match
+    handleAnnotatedValue = decoder.handleAnnotatedValue
+    lazy = decoder.lazyProperties
+    parse = decoder.parse
+
+    def scanValue(s, idx):
+        try:
+            c = s[idx]
+        except IndexError:
+            raise _error("Expecting value", s, idx) from None
+
+        if c == '"':
+            return scanstring(s, idx + 1, True)
+        elif c == '{':
+            return scanObject(s, idx + 1)
+        elif c == '[':
+            return scanArray(s, idx + 1)
+        elif c == 'n' and s.startswith('null', idx):
+            return None, idx + 4
+        elif c == 't' and s.startswith('true', idx):
+            return True, idx + 4
+        elif c == 'f' and s.startswith('false', idx):
+            return False, idx + 5
+
+        m = matchNumber(s, idx)
+        if m is not None:
+            integer, frac, exp = m.groups()
+            if frac or exp:
+                return float(m.group()), m.end()
+            return int(integer), m.end()
+        elif c == 'N' and s.startswith('NaN', idx):
+            return float('nan'), idx + 3
+        elif c == 'I' and s.startswith('Infinity', idx):
+            return float('inf'), idx + 8
+        elif c == '-' and s.startswith('-Infinity', idx):
+            return float('-inf'), idx + 9
+
+        raise _error("Unexpected character", s, idx)
+
+    def scanAgValue(s, idx):
+        value, end = scanValue(s, idx)
+
+        # Annotations directly follow their value in server output, so test
+        # for that before paying for whitespace skipping.
+        if s.startswith('::', end):
+            annoStart = end + 2
+        else:
+            annoStart = matchWs(s, end).end()
+            if not s.startswith('::', annoStart):
+                if lazy and value.__class__ is dict:
+                    resolveLazy(value)
+                return value, end
+            annoStart += 2
+
+        m = matchIdent(s, matchWs(s, annoStart).end())
+        if m is None:
+            raise _error("Expecting type annotation", s, annoStart)
+
+        anno = m.group()
+        if lazy and anno != "vertex" and anno != "edge" and value.__class__ is dict:
+            resolveLazy(value)
+        return handleAnnotatedValue(anno, value, s, idx, end), m.end()
+
+    # A map that turned out not to be a vertex or edge: decode its properties now.
+    def resolveLazy(obj):
+        props = obj.get("properties")
+        if props.__class__ is LazyProperties:
+            obj["properties"] = props.decode()
+
+    def scanObject(s, idx):
+        obj = {}
+        nextchar = s[idx:idx + 1]
+        if nextchar and nextchar in WS:
+            idx = matchWs(s, idx).end()
+            nextchar = s[idx:idx + 1]
+
+        if nextchar == '}':
+            return obj, idx + 1
+
+        while True:
+            if nextchar != '"':
+                raise _error("Expecting property name enclosed in double quotes", s, idx)
+            key, idx = scanstring(s, idx + 1, True)
+
+            if s[idx:idx + 1] != ':':
+                idx = matchWs(s, idx).end()
+                if s[idx:idx + 1] != ':':
+                    raise _error("Expecting ':' delimiter", s, idx)
+            idx += 1
+            if s[idx:idx + 1] in WS:
+                idx = matchWs(s, idx).end()
+
+            if lazy and key == "properties" and s[idx:idx + 1] == '{':
+                # Kept as text until first used, see LazyProperties.
+                end = _skipObject(s, idx)
+                obj[key] = LazyProperties(s[idx:end], parse)
+                idx = end
+            else:
+                obj[key], idx = scanAgValue(s, idx)
+
+            nextchar = s[idx:idx + 1]
+            if nextchar and nextchar in WS:
+                idx = matchWs(s, idx).end()
+                nextchar = s[idx:idx + 1]
+            idx += 1
+
+            if nextchar == '}':
+                return obj, idx
+            elif nextchar != ',':
+                raise _error("Expecting ',' delimiter", s, idx - 1)
+
+            nextchar = s[idx:idx + 1]
+            if nextchar and nextchar in WS:
+                idx = matchWs(s, idx).end()
+                nextchar = s[idx:idx + 1]
+
+    def scanArray(s, idx):
+        arr = []
+        nextchar = s[idx:idx + 1]
+        if nextchar and nextchar in WS:
+            idx = matchWs(s, idx).end()
+            nextchar = s[idx:idx + 1]
+
+        if nextchar == ']':
+            return arr, idx + 1
+
+        append = arr.append
+        while True:
+            value, idx = scanAgValue(s, idx)
+            append(value)
+
+            nextchar = s[idx:idx + 1]
+            if nextchar and nextchar in WS:
+                idx = matchWs(s, idx).end()
+                nextchar = s[idx:idx + 1]
+            idx += 1
+
+            if nextchar == ']':
+                return arr, idx
+            elif nextchar != ',':
+                raise _error("Expecting ',' delimiter", s, idx - 1)
+
+            if s[idx:idx + 1] in WS:
+                idx = matchWs(s, idx).end()
+
+    def scan(s):
+        idx = matchWs(s, 0).end()
+        value, end = scanAgValue(s, idx)
+        end = matchWs(s, end).end()
+        if end != len(s):
+            raise _error("Extra data", s, end)
+        return value
+
+    return scan
+
+
+class AgtypeDecoder:
+    """Decodes agtype text into python values, Vertex, Edge and Path in a single pass.
+
+    Drop-in replacement for Antlr4ResultHandler. String escapes are decoded
+    the same way the json module does.
+
+    With jsonFastPath, values without any '::' annotation are plain JSON and
+    are handed to the C accelerated json decoder instead.
+
+    With lazyProperties, the properties of vertices and edges are kept as
+    agtype text and decoded on first access.
+    """
+
+    def __init__(self, vertexCache=None, jsonFastPath=True, lazyProperties=False):
+        self.vertexCache = vertexCache
+        self.jsonFastPath = jsonFastPath
+        self.lazyProperties = lazyProperties
+        self._scan = _makeScanner(self)
+        # parse_float/parse_int are the builtins so the C scanner stays in use.
+        self._loads = json.JSONDecoder(parse_float=float, parse_int=int,
+                                       parse_constant=FLOAT_CONSTANTS.__getitem__).decode
+
+    def parse(self, ageData):
+        if not ageData:
+            return None
+        if self.jsonFastPath and '::' not in ageData:
+            try:
+                return self._loads(ageData)
+            except ValueError as ex:
+                raise AGTypeError("Agtype decode ERR[" + str(ex) + "](" + ageData + ")", ex) from None
+        return self._scan(ageData)
+
+    # Decode a value in the binary (agtype_send) format.
+    def parseBinary(self, ageData):
+        if ageData is None:
+            return None
+        ageData = bytes(ageData)
+        if len(ageData) == 0 or ageData[0] != BINARY_VERSION:
+            version = ageData[0] if ageData else None
+            raise AGTypeError("Unsupported agtype binary version:" + str(version), None)
+        return self.parse(ageData[1:].decode('utf-8'))
+
+    def handleAnnotatedValue(self, anno:str, value, s:str, start:int, end:int):
+        if anno == "numeric":
+            return Decimal(s[start:end])
+        elif anno == "vertex":
+            return self.newVertex(value)
+        elif anno == "edge":
+            return self.newEdge(value)
+        elif anno == "path":
+            return Path(value)
+
+        return value
+
+    # vertexCache (a dict or IdentityMap keyed by graph id) holds edges too:
+    # vertex and edge ids of one graph never collide. A cached entity read again
+    # gets the label and properties just read, so it keeps its identity and
+    # shows changes made by SET or REMOVE since.
+    def newVertex(self, d:dict):
+        vid = d["id"]
+        cache = self.vertexCache
+        if cache != None:
+            vertex = cache.get(vid)
+            if vertex != None:
+                vertex.label = d["label"]
+                vertex.properties = d["properties"]
+                return vertex
+
+        vertex = Vertex(vid, d["label"], d["properties"])
+        if cache != None:
+            cache[vid] = vertex
+        return vertex
+
+    def newEdge(self, d:dict):
+        eid = d["id"]
+        cache = self.vertexCache
+        if cache != None:
+            edge = cache.get(eid)
+            if edge != None:
+                edge.label = d["label"]
+                edge.properties = d["properties"]
+                return edge
+
+        edge = Edge(eid, d["label"], d["properties"], d["start_id"], d["end_id"])
+        if cache != None:
+            cache[eid] = edge
+        return edge
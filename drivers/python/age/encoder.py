@@ -0,0 +1,171 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii as encodeString
+from psycopg2 import extensions as ext
+from .models import Vertex, Edge, Path
+
+# Python -> agtype text.
+# Values made of JSON types only go through the C json encoder: its NaN,
+# Infinity and -Infinity are agtype float literals too. Anything else is
+# written by _encode in one pass over the value: Decimal as '<digits>::numeric',
+# Vertex, Edge and Path with their '::vertex', '::edge' and '::path' annotations.
+
+_dumps = json.JSONEncoder(check_circular=False).encode
+
+
+def toAgtype(value) -> str:
+    try:
+        return _dumps(value)
+    except TypeError:
+        parts = []
+        _encode(value, parts.append)
+        return "".join(parts)
+
+
+def _floatText(value:float) -> str:
+    if value != value:
+        return "NaN"
+    if value == float('inf'):
+        return "Infinity"
+    if value == float('-inf'):
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def _encodeMap(value:dict, write):
+    write("{")
+    first = True
+    for k, v in value.items():
+        if first:
+            first = False
+        else:
+            write(", ")
+        write(encodeString(k if isinstance(k, str) else str(k)))
+        write(": ")
+        _encode(v, write)
+    write("}")
+
+
+def _encodeList(value, write):
+    write("[")
+    first = True
+    for v in value:
+        if first:
+            first = False
+        else:
+            write(", ")
+        _encode(v, write)
+    write("]")
+
+
+def _encode(value, write):
+    cls = value.__class__
+    if value is None:
+        write("null")
+    elif cls is str:
+        write(encodeString(value))
+    elif value is True:
+        write("true")
+    elif value is False:
+        write("false")
+    elif cls is int:
+        write(int.__repr__(value))
+    elif cls is float:
+        write(_floatText(value))
+    elif cls is dict:
+        _encodeMap(value, write)
+    elif cls is list or cls is tuple:
+        _encodeList(value, write)
+    elif cls is Decimal:
+        write(str(value))
+        write("::numeric")
+    elif isinstance(value, Vertex):
+        write('{"id": ')
+        _encode(value.id, write)
+        write(', "label": ')
+        _encode(value.label, write)
+        write(', "properties": ')
+        _encode(value.properties if value.properties != None else {}, write)
+        write("}::vertex")
+    elif isinstance(value, Edge):
+        write('{"id": ')
+        _encode(value.id, write)
+        write(', "label": ')
+        _encode(value.label, write)
+        write(', "end_id": ')
+        _encode(value.end_id, write)
+        write(', "start_id": ')
+        _encode(value.start_id, write)
+        write(', "properties": ')
+        _encode(value.properties if value.properties != None else {}, write)
+        write("}::edge")
+    elif isinstance(value, Path):
+        _encodeList(value.entities, write)
+        write("::path")
+    # subclasses of the builtin types
+    elif isinstance(value, str):
+        write(encodeString(value))
+    elif isinstance(value, int):
+        write(int.__repr__(value))
+    elif isinstance(value, float):
+        write(_floatText(value))
+    elif isinstance(value, Decimal):
+        write(str(value))
+        write("::numeric")
+    elif isinstance(value, dict):
+        _encodeMap(value, write)
+    elif isinstance(value, (list, tuple)):
+        _encodeList(value, write)
+    else:
+        raise TypeError("Object of type " + type(value).__name__ + " is not agtype serializable")
+
+
+class Agtype:
+    """psycopg2 adapter sending a python value as an agtype literal.
+
+        cursor.execute("SELECT %s", (Agtype({"n": Decimal("1.5")}),))
+
+    Vertex, Edge and Path are adapted this way without wrapping once setUpAge
+    has run (see registerAdapters).
+    """
+
+    def __init__(self, value) -> None:
+        self.value = value
+        self._conn = None
+
+    def __conform__(self, proto):
+        if proto is ext.ISQLQuote:
+            return self
+
+    def prepare(self, conn):
+        self._conn = conn
+
+    def getquoted(self) -> bytes:
+        quoted = ext.QuotedString(toAgtype(self.value))
+        if self._conn != None:
+            quoted.prepare(self._conn)
+        return quoted.getquoted() + b"::agtype"
+
+    def __str__(self) -> str:
+        return self.getquoted().decode('ascii', 'replace')
+
+
+def registerAdapters():
+    ext.register_adapter(Vertex, Agtype)
+    ext.register_adapter(Edge, Agtype)
+    ext.register_adapter(Path, Agtype)
@@ -16,7 +16,7 @@
 from psycopg2.errors import *
 
 class AgeNotSet(Exception):
-    def __init__(self, name):
+    def __init__(self, name=None):
         self.name = name
 
     def __repr__(self) :
@@ -65,3 +65,11 @@ class AGTypeError(Exception):
         self.msg = msg
         self.cause = cause
         super().__init__(msg, cause)
+
+class PoolError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+        super().__init__(msg)
+
+    def __repr__(self) :
+        return 'PoolError [' + self.msg + ']'
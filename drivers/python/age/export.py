@@ -0,0 +1,85 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import re
+from .models import toJsonValue, encodeJsonString
+from .parallel import rawAgtypeColumns
+
+# A JSON string (kept as is), a '::ident' type annotation (dropped) or a NaN or
+# infinite number, which JSON does not have (null).
+ANNOTATION_RE = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|::[A-Z_a-z][$0-9A-Z_a-z]*|(-?Infinity|NaN)')
+
+ROW_OBJECT = "object"    # {"column": value, ...}
+ROW_ARRAY = "array"      # [value, ...]
+ROW_VALUE = "value"      # value of the first column
+
+DEFAULT_EXPORT_CHUNK_SIZE = 5000
+
+
+def _keepString(m):
+    if m.group(2) != None:
+        return "null"
+    return m.group(1) or ""
+
+
+# agtype text as JSON: annotations removed, NaN and infinite numbers null,
+# everything else passed through. Vertices and edges become their
+# {"id", "label", ..., "properties"} maps and numerics plain JSON numbers.
+# Text without '::', NaN or Infinity is returned unchanged.
+def stripAnnotations(text:str) -> str:
+    if "::" not in text and "NaN" not in text and "Infinity" not in text:
+        return text
+    return ANNOTATION_RE.sub(_keepString, text)
+
+
+# Write the remaining rows of 'cursor' to 'out' as newline delimited JSON,
+# chunkSize rows per out.write() call. Returns the number of rows written.
+# With rawOid, columns of that type hold undecoded agtype text (see
+# age.parallel.registerRawAgtype) that is passed through stripAnnotations; other
+# values go through toJsonValue. Both write vertices, edges and paths in the same shape.
+def exportNdjson(cursor, out, rawOid:int=None, rowFormat:str=ROW_OBJECT, chunkSize:int=DEFAULT_EXPORT_CHUNK_SIZE) -> int:
+    if rowFormat not in (ROW_OBJECT, ROW_ARRAY, ROW_VALUE):
+        raise ValueError("Unknown rowFormat: " + str(rowFormat))
+
+    def jsonText(value, raw):
+        if value is None:
+            return "null"
+        if raw and value.__class__ is str:
+            return stripAnnotations(value)
+        return toJsonValue(value)
+
+    keys = None
+    raw = None
+    count = 0
+    while True:
+        rows = cursor.fetchmany(chunkSize)
+        if len(rows) == 0:
+            break
+        if keys == None:
+            # Named cursors only have a description after the first fetch.
+            keys = [encodeJsonString(d[0]) + ": " for d in cursor.description]
+            raw = rawAgtypeColumns(cursor, rawOid)
+
+        if rowFormat == ROW_OBJECT:
+            lines = ["{" + ", ".join([k + jsonText(v, r) for k, v, r in zip(keys, row, raw)]) + "}" for row in rows]
+        elif rowFormat == ROW_ARRAY:
+            lines = ["[" + ", ".join([jsonText(v, r) for v, r in zip(row, raw)]) + "]" for row in rows]
+        else:
+            raw0 = raw[0]
+            lines = [jsonText(row[0], raw0) for row in rows]
+        lines.append("")
+        out.write("\n".join(lines))
+        count += len(rows)
+    return count
@@ -14,6 +14,9 @@
 # under the License.
 
 import json
+import math
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii as encodeJsonString
 from io import StringIO 
 
 
@@ -28,6 +31,9 @@ class Graph():
         self.statement = stmt
         self.rows = list()
         self.vertices = dict()
+        self.edges = dict()
+        self.outEdges = dict()    # vertex id -> edges starting at it
+        self.inEdges = dict()     # vertex id -> edges ending at it
 
     def __iter__(self):
         return self.rows.__iter__()
@@ -53,16 +59,85 @@ class Graph():
         else:
             return None
 
+    def getEdges(self):
+        return self.edges
+
+    def getEdge(self, id):
+        return self.edges.get(id)
+
+    # Append a result row and index the vertices and edges found in it.
+    def addRow(self, row):
+        self.rows.append(row)
+        self.index(row)
+
+    # Index the vertices and edges in value, looking into rows, lists, maps and paths.
+    # The first object seen for an id is kept.
+    def index(self, value):
+        if isinstance(value, Vertex):
+            if value.id not in self.vertices:
+                self.vertices[value.id] = value
+        elif isinstance(value, Edge):
+            if value.id not in self.edges:
+                self.edges[value.id] = value
+                self.outEdges.setdefault(value.start_id, []).append(value)
+                self.inEdges.setdefault(value.end_id, []).append(value)
+        elif isinstance(value, Path):
+            for entity in value.entities:
+                self.index(entity)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self.index(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                self.index(item)
+
+    def outgoing(self, id) -> list:
+        return self.outEdges.get(id, [])
+
+    def incoming(self, id) -> list:
+        return self.inEdges.get(id, [])
+
+    # Ids of the vertices connected to vertex 'id' by the indexed edges.
+    # direction is "out", "in" or "both".
+    def neighbors(self, id, direction:str="both") -> list:
+        ids = []
+        if direction != "in":
+            ids.extend(edge.end_id for edge in self.outEdges.get(id, []))
+        if direction != "out":
+            ids.extend(edge.start_id for edge in self.inEdges.get(id, []))
+        return ids
+
+# Properties of a vertex or edge kept as agtype text until first used.
+class LazyProperties:
+    __slots__ = ('raw', 'parse')
+
+    def __init__(self, raw:str, parse) -> None:
+        self.raw = raw
+        self.parse = parse
+
+    def decode(self):
+        return self.parse(self.raw)
+
+
+# Model classes use __slots__: no per instance __dict__, which matters when
+# millions of vertices are held in memory.
 class AGObj:
+    __slots__ = ()
+
     @property
     def gtype(self):
         return TP_NONE
 
 
 class Path(AGObj):
-    entities = []
+    __slots__ = ('entities',)
+
     def __init__(self, entities=None) -> None:
-        self.entities = entities
+        self.entities = entities if entities != None else []
+
+    # Pickle as constructor arguments, e.g. to pass results between processes.
+    def __reduce__(self):
+        return (Path, (self.entities,))
 
     @property
     def gtype(self):
@@ -105,6 +180,10 @@ class Path(AGObj):
 
     def toJson(self) -> str:
         buf = StringIO()
+        self._toJson(buf)
+        return buf.getvalue()
+
+    def _toJson(self, buf):
         buf.write("{\"gtype\": \"path\", \"elements\": [")
         
         max = len(self.entities)
@@ -116,16 +195,30 @@ class Path(AGObj):
             idx += 1
         buf.write("]}")
 
-        return buf.getvalue()
-
 
     
 
 class Vertex(AGObj):
+    __slots__ = ('id', 'label', '_properties')
+
     def __init__(self, id=None, label=None, properties=None) -> None:
         self.id = id
         self.label = label
-        self.properties = properties
+        self._properties = properties
+
+    @property
+    def properties(self):
+        props = self._properties
+        if props.__class__ is LazyProperties:
+            props = self._properties = props.decode()
+        return props
+
+    @properties.setter
+    def properties(self, value):
+        self._properties = value
+
+    def __reduce__(self):
+        return (Vertex, (self.id, self.label, self.properties))
 
     @property
     def gtype(self):
@@ -160,12 +253,28 @@ class Vertex(AGObj):
 
 
 class Edge(AGObj):
-    def __init__(self, id=None, label=None, properties=None) -> None:
+    __slots__ = ('id', 'label', 'start_id', 'end_id', '_properties')
+
+    def __init__(self, id=None, label=None, properties=None, start_id=None, end_id=None) -> None:
         self.id = id
         self.label = label
-        self.start_id = None
-        self.end_id = None
-        self.properties = properties
+        self.start_id = start_id
+        self.end_id = end_id
+        self._properties = properties
+
+    @property
+    def properties(self):
+        props = self._properties
+        if props.__class__ is LazyProperties:
+            props = self._properties = props.decode()
+        return props
+
+    @properties.setter
+    def properties(self, value):
+        self._properties = value
+
+    def __reduce__(self):
+        return (Edge, (self.id, self.label, self.properties, self.start_id, self.end_id))
 
     @property
     def gtype(self):
@@ -204,14 +313,12 @@ class Edge(AGObj):
 
     def extraJsonFormat(node, buf):
         if node.start_id != None:
-            buf.write(", \"start_id\": \"")
+            buf.write(", \"start_id\": ")
             buf.write(str(node.start_id))
-            buf.write("\"")
 
         if node.end_id != None:
-            buf.write(", \"end_id\": \"")
+            buf.write(", \"end_id\": ")
             buf.write(str(node.end_id))
-            buf.write("\"")
 
     def toJson(self) -> str:
         return nodeToJson(self, Edge.extraJsonFormat)
@@ -269,9 +376,8 @@ def _nodeToJson(node, buf, extraFormatter=None):
         buf.write("\"edge\", ")
 
     if node.label != None:
-        buf.write("\"label\":\"")
-        buf.write(node.label)
-        buf.write("\"")
+        buf.write("\"label\":")
+        buf.write(encodeJsonString(node.label))
         
     if node.id != None:
         buf.write(", \"id\":")
@@ -281,14 +387,86 @@ def _nodeToJson(node, buf, extraFormatter=None):
         extraFormatter(node, buf)
         
     if node.properties != None:
-        buf.write(", \"properties\":{")
+        buf.write(", \"properties\":")
+        # Property values keep their JSON types.
+        _writeJson(node.properties, buf)
+    buf.write("}")
 
-        prop_list = []
-        for k, v in node.properties.items():
-            prop_list.append(f"\"{k}\": \"{str(v)}\"")
 
-        # Join properties with comma and write to buffer
-        buf.write(", ".join(prop_list))
+# JSON text of a result value, in the shape agtype text has without annotations:
+# vertices and edges as {"id", "label", ["end_id", "start_id",] "properties"} maps and
+# paths as arrays of them. Decimal (agtype numeric) is a JSON number with all its digits,
+# NaN and infinite numbers are null.
+def toJsonValue(value) -> str:
+    try:
+        return json.dumps(value, allow_nan=False)
+    except (TypeError, ValueError):
+        buf = StringIO()
+        _writeJson(value, buf, entityMaps=True)
+        return buf.getvalue()
+
+
+# With entityMaps, vertices, edges and paths are written as toJsonValue describes,
+# otherwise with their toJson().
+def _writeJson(value, buf, entityMaps=False):
+    if value is None:
+        buf.write("null")
+    elif isinstance(value, str):
+        buf.write(encodeJsonString(value))
+    elif value is True:
+        buf.write("true")
+    elif value is False:
+        buf.write("false")
+    elif isinstance(value, int):
+        buf.write(int.__repr__(value))
+    elif isinstance(value, float):
+        # JSON has no NaN or Infinity.
+        buf.write(float.__repr__(value) if math.isfinite(value) else "null")
+    elif isinstance(value, Decimal):
+        buf.write(str(value) if value.is_finite() else "null")
+    elif isinstance(value, AGObj):
+        if entityMaps:
+            _writeEntityMap(value, buf)
+        else:
+            value._toJson(buf)
+    elif isinstance(value, dict):
+        buf.write("{")
+        first = True
+        for k, v in value.items():
+            if not first:
+                buf.write(", ")
+            first = False
+            buf.write(encodeJsonString(str(k)))
+            buf.write(": ")
+            _writeJson(v, buf, entityMaps)
         buf.write("}")
-    buf.write("}")
-    
\ No newline at end of file
+    elif isinstance(value, (list, tuple)):
+        buf.write("[")
+        first = True
+        for v in value:
+            if not first:
+                buf.write(", ")
+            first = False
+            _writeJson(v, buf, entityMaps)
+        buf.write("]")
+    else:
+        buf.write(json.dumps(value))
+
+
+# A vertex or edge as its agtype map, a path as the array of its vertices and edges.
+def _writeEntityMap(value, buf):
+    if value.gtype == TP_PATH:
+        _writeJson(value.entities, buf, True)
+        return
+    buf.write("{\"id\": ")
+    _writeJson(value.id, buf)
+    buf.write(", \"label\": ")
+    _writeJson(value.label, buf)
+    if value.gtype == TP_EDGE:
+        buf.write(", \"end_id\": ")
+        _writeJson(value.end_id, buf)
+        buf.write(", \"start_id\": ")
+        _writeJson(value.start_id, buf)
+    buf.write(", \"properties\": ")
+    _writeJson(value.properties if value.properties != None else {}, buf)
+    buf.write("}")
\ No newline at end of file
@@ -0,0 +1,274 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import bisect
+import logging
+import threading
+import time
+from psycopg2 import extensions as ext
+
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_log = logging.getLogger(__name__)
+
+
+class QueryObserver:
+    """Receives the timing of cypher queries run on a connection.
+
+    Subclass it and override what you need, then register it with
+    Age.addObserver (or addObserver(conn, observer)). For each query:
+
+        beforeExecute(event)    before the statement is sent
+        afterExecute(event)     the statement ran, event.executeSeconds is set
+        afterFetch(event)       the result was read to the end or its cursor closed;
+                                event.rows, decodeSeconds and bytesReceived are set
+        onError(event, error)   execution or decoding failed
+
+    afterFetch is only called for cursors created by execCypher/execCypherPrepared;
+    cypher() runs on the caller's cursor and reports execution only.
+    Observers run on the thread that runs the query, so they should be quick.
+    Exceptions raised by an observer are logged and do not affect the query.
+    """
+
+    def beforeExecute(self, event):
+        pass
+
+    def afterExecute(self, event):
+        pass
+
+    def afterFetch(self, event):
+        pass
+
+    def onError(self, event, error):
+        pass
+
+
+class QueryEvent:
+    __slots__ = ('observers', 'connection', 'graphName', 'cypherStmt', 'stmt', 'explain', 'startTime', 'executeSeconds',
+                 'totalSeconds', 'rows', 'decodeSeconds', 'bytesReceived', 'error', 'finished', 'context')
+
+    def __init__(self, observers:tuple, connection, graphName:str, cypherStmt:str, stmt:str, explain=None):
+        self.observers = observers
+        self.connection = connection
+        self.graphName = graphName
+        self.cypherStmt = cypherStmt    # cypher query as given
+        self.stmt = stmt                # SQL sent to the server
+        self.explain = explain          # builds the query as one statement, see explainStmt
+        self.startTime = time.perf_counter()
+        self.executeSeconds = None      # sending the statement until its result is ready
+        self.totalSeconds = None        # until the result was read or the cursor closed
+        self.rows = 0
+        self.decodeSeconds = 0.0        # time spent decoding agtype values
+        self.bytesReceived = 0          # UTF-8 bytes of the agtype text decoded
+        self.error = None
+        self.finished = False
+        self.context = {}               # free for observers, e.g. to keep a span
+
+    # The query as a single SQL statement (stmt may be a batch), or None if unknown.
+    def explainStmt(self) -> str:
+        if self.explain == None:
+            return None
+        return self.explain()
+
+    # Call 'method' on every observer. A failing observer is logged, never raised.
+    def _notify(self, method:str, *args):
+        for observer in self.observers:
+            try:
+                getattr(observer, method)(self, *args)
+            except Exception:
+                _log.exception("query observer %r failed in %s", observer, method)
+
+    def start(self):
+        self._notify("beforeExecute")
+        return self
+
+    def executed(self):
+        self.executeSeconds = time.perf_counter() - self.startTime
+        self._notify("afterExecute")
+
+    def fail(self, error:Exception):
+        if self.finished:
+            return
+        self.finished = True
+        self.error = error
+        self.totalSeconds = time.perf_counter() - self.startTime
+        self._notify("onError", error)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.totalSeconds = time.perf_counter() - self.startTime
+        self._notify("afterFetch")
+
+    def __repr__(self) -> str:
+        return "QueryEvent(rows=" + str(self.rows) + ", executeSeconds=" + str(self.executeSeconds) + \
+            ", decodeSeconds=" + str(self.decodeSeconds) + ", totalSeconds=" + str(self.totalSeconds) + \
+            ", error=" + repr(self.error) + ")"
+
+
+class ObservedCursor:
+    """Cursor mixin counting fetched rows and finishing its QueryEvent when the
+    result has been read or the cursor is closed. See observedCursorClass."""
+
+    ageEvent = None
+
+    def _fetched(self, count:int, done:bool):
+        event = self.ageEvent
+        if event == None:
+            return
+        event.rows += count
+        # A client side cursor knows its row count, a named one is done on a short fetch.
+        if done or (self.name == None and self.rownumber >= self.rowcount):
+            event.finish()
+
+    def _failed(self, error:Exception):
+        if self.ageEvent != None:
+            self.ageEvent.fail(error)
+
+    def fetchone(self):
+        try:
+            row = super().fetchone()
+        except Exception as error:
+            self._failed(error)
+            raise
+        self._fetched(0 if row == None else 1, row == None)
+        return row
+
+    def fetchmany(self, size:int=None):
+        if size == None:
+            size = self.arraysize
+        try:
+            rows = super().fetchmany(size)
+        except Exception as error:
+            self._failed(error)
+            raise
+        self._fetched(len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        try:
+            rows = super().fetchall()
+        except Exception as error:
+            self._failed(error)
+            raise
+        self._fetched(len(rows), True)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if len(rows) == 0:
+                return
+            yield from rows
+
+    # The statement ran. An empty client side result is done right away.
+    def _executed(self):
+        event = self.ageEvent
+        event.executed()
+        if self.name == None and self.rownumber >= self.rowcount:
+            event.finish()
+
+    def close(self):
+        if self.ageEvent != None:
+            self.ageEvent.finish()
+        super().close()
+
+
+_observedClasses = {}
+
+# 'cls' with ObservedCursor mixed in, so custom cursor factories keep working.
+def observedCursorClass(cls):
+    observed = _observedClasses.get(cls)
+    if observed == None:
+        observed = type("Observed" + cls.__name__, (ObservedCursor, cls), {})
+        _observedClasses[cls] = observed
+    return observed
+
+
+# Time the agtype typecaster of 'cursor' into event. Must be called before the cursor executes.
+def observeDecoding(cursor:ext.cursor, oid:int, event:QueryEvent):
+    caster = cursor.string_types.get(oid)
+    if caster == None:
+        caster = cursor.connection.string_types.get(oid)
+    if caster == None:
+        return
+
+    def timedCast(value, cur):
+        if value is None:
+            return None
+        start = time.perf_counter()
+        try:
+            return caster(value, cur)
+        finally:
+            event.decodeSeconds += time.perf_counter() - start
+            # value is already decoded text; count its UTF-8 bytes, encoding only non-ASCII text.
+            event.bytesReceived += len(value) if value.isascii() else len(value.encode('utf-8'))
+
+    ext.register_type(ext.new_type((oid,), 'AGETYPE_OBSERVED', timedCast), cursor)
+
+
+class LatencyHistogram(QueryObserver):
+    """Prometheus style cumulative histograms of query times, plus row, byte
+    and error counters. snapshot() returns a copy to export.
+
+        hist = LatencyHistogram()
+        ag.addObserver(hist)
+        ...
+        hist.snapshot()["total"]["buckets"]
+    """
+
+    def __init__(self, buckets:tuple=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = dict((name, self._newSeries()) for name in ("execute", "decode", "total"))
+        self.rows = 0
+        self.bytesReceived = 0
+        self.errors = 0
+
+    def _newSeries(self) -> dict:
+        return {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+
+    def _observe(self, name:str, seconds:float):
+        series = self._series[name]
+        series["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+        series["sum"] += seconds
+        series["count"] += 1
+
+    def afterFetch(self, event):
+        with self._lock:
+            if event.executeSeconds != None:
+                self._observe("execute", event.executeSeconds)
+            self._observe("decode", event.decodeSeconds)
+            self._observe("total", event.totalSeconds)
+            self.rows += event.rows
+            self.bytesReceived += event.bytesReceived
+
+    def onError(self, event, error):
+        with self._lock:
+            self.errors += 1
+
+    # Per series: cumulative (upper bound, count) buckets ending with +Inf, sum and count.
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {"rows": self.rows, "bytesReceived": self.bytesReceived, "errors": self.errors}
+            for name, series in self._series.items():
+                buckets = []
+                total = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                    total += count
+                    buckets.append((bound, total))
+                result[name] = {"buckets": buckets, "sum": series["sum"], "count": series["count"]}
+            return result
@@ -0,0 +1,78 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+from collections import deque
+from psycopg2 import extensions as ext
+from .decoder import AgtypeDecoder
+
+DEFAULT_PARALLEL_CHUNK_SIZE = 5000
+
+
+# Make 'cursor' return agtype columns as undecoded text.
+def registerRawAgtype(cursor:ext.cursor, oid:int):
+    ext.register_type(ext.new_type((oid,), 'AGETYPE_TEXT', ext.UNICODE), cursor)
+
+
+# One flag per column of 'cursor' telling whether it holds raw agtype text:
+# its type is rawOid, the agtype oid passed to registerRawAgtype.
+def rawAgtypeColumns(cursor:ext.cursor, rawOid:int) -> list:
+    return [rawOid != None and d[1] == rawOid for d in cursor.description]
+
+
+# Decoders of a worker process, by jsonFastPath.
+_workerDecoders = {}
+
+# Runs in the worker processes: decode the raw columns (flagged in 'raw') of one chunk of rows.
+def decodeRows(rows:list, raw:tuple, jsonFastPath:bool=True) -> list:
+    decoder = _workerDecoders.get(jsonFastPath)
+    if decoder == None:
+        decoder = _workerDecoders[jsonFastPath] = AgtypeDecoder(None, jsonFastPath=jsonFastPath)
+    parse = decoder.parse
+    return [tuple(parse(value) if r and value is not None else value for value, r in zip(row, raw)) for row in rows]
+
+
+# Fetch raw rows from 'cursor' chunkSize at a time and decode the chunks on 'executor'.
+# Only columns of type rawOid (see registerRawAgtype) are decoded, other columns are kept
+# as the cursor returned them. The workers decode with the jsonFastPath of 'decoder';
+# vertices and edges come back pickled, so their properties are always decoded and
+# a decoder with an identity map (vertexCache) is refused.
+# At most 'prefetch' chunks are in flight, and rows are yielded in cursor order.
+def iterDecoded(cursor:ext.cursor, executor, rawOid:int, chunkSize:int=DEFAULT_PARALLEL_CHUNK_SIZE, prefetch:int=None,
+                decoder:AgtypeDecoder=None):
+    if decoder != None and decoder.vertexCache != None:
+        raise ValueError("Parallel decoding can not use an identity map")
+    jsonFastPath = decoder.jsonFastPath if decoder != None else True
+    if prefetch == None:
+        prefetch = 2 * (os.cpu_count() or 1)
+
+    pending = deque()
+    exhausted = False
+    raw = None
+    while True:
+        while not exhausted and len(pending) < prefetch:
+            rows = cursor.fetchmany(chunkSize)
+            if len(rows) == 0:
+                exhausted = True
+            else:
+                if raw == None:
+                    # Named cursors only have a description after the first fetch.
+                    raw = tuple(rawAgtypeColumns(cursor, rawOid))
+                pending.append(executor.submit(decodeRows, [tuple(row) for row in rows], raw, jsonFastPath))
+
+        if len(pending) == 0:
+            return
+        for row in pending.popleft().result():
+            yield row
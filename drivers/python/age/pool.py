@@ -0,0 +1,230 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from psycopg2 import extensions as ext
+from .exceptions import *
+from .age import Age
+from .cache import DEFAULT_STATEMENT_CACHE_SIZE
+
+
+class AgePool:
+    """Thread-safe pool of connected Age instances.
+
+    Connections are opened with AGE loaded, the search_path set and the graph
+    checked once, and are then reused:
+
+        pool = AgePool(minSize=2, maxSize=10, graph="g", dsn="...")
+        with pool.connection() as ag:
+            ag.execCypher(...)
+            ag.commit()
+
+    A connection is rolled back when it is returned with an open transaction
+    and closed after maxUses borrows (0 means never). With checkOnBorrow, a
+    connection that sat idle for checkIdleAfter seconds or more is health
+    checked with 'SELECT 1' before it is handed out; recently used ones are
+    not, so a busy pool pays no extra round trips. Every connection gets the
+    given QueryObservers.
+    """
+
+    def __init__(self, minSize:int=1, maxSize:int=10, graph:str=None, dsn:str=None,
+                 maxUses:int=0, checkOnBorrow:bool=True, checkIdleAfter:float=30.0, timeout:float=None,
+                 statementCacheSize:int=DEFAULT_STATEMENT_CACHE_SIZE, observers:list=None,
+                 connection_factory=None, cursor_factory=None, **kwargs):
+        if minSize < 0 or maxSize < 1 or minSize > maxSize:
+            raise ValueError("pool size must satisfy 0 <= minSize <= maxSize and maxSize >= 1")
+
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.graphName = graph
+        self.maxUses = maxUses
+        self.checkOnBorrow = checkOnBorrow
+        self.checkIdleAfter = checkIdleAfter
+        self.timeout = timeout
+        self._dsn = dsn
+        self._connectArgs = dict(connection_factory=connection_factory, cursor_factory=cursor_factory, **kwargs)
+        self._statementCacheSize = statementCacheSize
+        self.observers = list(observers) if observers != None else []
+
+        self._lock = threading.Condition()
+        self._idle = deque()
+        self._idleSince = dict()    # idle Age -> time.monotonic() it was returned
+        self._borrowed = set()
+        self._uses = dict()         # Age -> number of borrows
+        self._opened = 0            # connections open or being opened
+        self._closed = False
+
+        try:
+            for _ in range(minSize):
+                with self._lock:
+                    self._opened += 1
+                ag = self._open()
+                self._idle.append(ag)
+                self._idleSince[ag] = time.monotonic()
+        except Exception:
+            # Do not leak the connections opened before the failure.
+            self.close()
+            raise
+
+    def _open(self) -> Age:
+        try:
+            ag = Age(self._statementCacheSize)
+            ag.connect(graph=self.graphName, dsn=self._dsn, **self._connectArgs)
+            for observer in self.observers:
+                ag.addObserver(observer)
+            # Keep the session setup (search_path) out of later rollbacks.
+            ag.commit()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+                self._lock.notify()
+            raise
+        self._uses[ag] = 0
+        return ag
+
+    def _discard(self, ag:Age):
+        self._uses.pop(ag, None)
+        try:
+            if not ag.connection.closed:
+                ag.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._opened -= 1
+            self._lock.notify()
+
+    def _isHealthy(self, ag:Age, idleSeconds:float) -> bool:
+        conn = ag.connection
+        if conn == None or conn.closed:
+            return False
+        if not self.checkOnBorrow or idleSeconds < self.checkIdleAfter:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # Borrow an Age. Blocks up to timeout seconds when maxSize connections are in use.
+    def getconn(self, timeout:float=None) -> Age:
+        if timeout == None:
+            timeout = self.timeout
+        deadline = None if timeout == None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise PoolError("pool is closed")
+                    if len(self._idle) > 0:
+                        ag = self._idle.pop()
+                        idleSeconds = time.monotonic() - self._idleSince.pop(ag)
+                        break
+                    if self._opened < self.maxSize:
+                        self._opened += 1
+                        ag = None
+                        break
+                    remaining = None if deadline == None else deadline - time.monotonic()
+                    if remaining != None and remaining <= 0:
+                        raise PoolError("no connection available within " + str(timeout) + " seconds")
+                    self._lock.wait(remaining)
+
+            if ag == None:
+                ag = self._open()
+            elif not self._isHealthy(ag, idleSeconds):
+                self._discard(ag)
+                continue
+
+            with self._lock:
+                self._borrowed.add(ag)
+            self._uses[ag] += 1
+            return ag
+
+    # Return a borrowed Age. Broken or worn out connections are closed and
+    # replaced as needed to keep minSize connections open.
+    def putconn(self, ag:Age, discard:bool=False):
+        with self._lock:
+            if ag not in self._borrowed:
+                if ag in self._uses:
+                    raise PoolError("connection is not borrowed, it was returned already")
+                raise PoolError("connection does not belong to this pool")
+            self._borrowed.remove(ag)
+
+        conn = ag.connection
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != ext.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or conn.closed or self._closed or (self.maxUses > 0 and self._uses[ag] >= self.maxUses):
+            self._discard(ag)
+            self._refill()
+            return
+
+        with self._lock:
+            self._idle.append(ag)
+            self._idleSince[ag] = time.monotonic()
+            self._lock.notify()
+
+    def _refill(self):
+        while True:
+            with self._lock:
+                if self._closed or self._opened >= self.minSize:
+                    return
+                self._opened += 1
+            ag = self._open()
+            with self._lock:
+                self._idle.append(ag)
+                self._idleSince[ag] = time.monotonic()
+                self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout:float=None):
+        ag = self.getconn(timeout)
+        try:
+            yield ag
+        except Exception:
+            self.putconn(ag, discard=ag.connection.closed)
+            raise
+        else:
+            self.putconn(ag)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._idleSince.clear()
+            self._lock.notify_all()
+        for ag in idle:
+            self._discard(ag)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"opened": self._opened, "idle": len(self._idle),
+                    "minSize": self.minSize, "maxSize": self.maxSize}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        self.close()
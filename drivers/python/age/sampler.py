@@ -0,0 +1,172 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from psycopg2 import extensions as ext
+from .observer import QueryObserver
+
+EXPLAIN_SAVEPOINT = "age_explain"
+
+SAMPLE_SLOW = "slow"
+SAMPLE_RANDOM = "sampled"
+
+
+class QueryPlan:
+    __slots__ = ('template', 'graphName', 'stmt', 'seconds', 'reason', 'plan', 'error', 'capturedAt')
+
+    def __init__(self, template:str, graphName:str, stmt:str, seconds:float, reason:str, plan=None, error:Exception=None):
+        self.template = template        # cypher query as given to execCypher
+        self.graphName = graphName
+        self.stmt = stmt                # SQL that was explained
+        self.seconds = seconds          # execute time of the sampled query
+        self.reason = reason            # SAMPLE_SLOW or SAMPLE_RANDOM
+        self.plan = plan                # EXPLAIN output: text, or the parsed JSON with explainFormat="JSON"
+        self.error = error
+        self.capturedAt = time.time()
+
+    def __repr__(self) -> str:
+        return "QueryPlan(" + self.reason + ", " + ("%.3fs" % self.seconds) + ", " + repr(self.template) + ")"
+
+    def __str__(self) -> str:
+        if self.error != None:
+            return repr(self) + "\n" + repr(self.error)
+        if isinstance(self.plan, str):
+            return repr(self) + "\n" + self.plan
+        return repr(self) + "\n" + repr(self.plan)
+
+
+class SlowQuerySampler(QueryObserver):
+    """Captures EXPLAIN (ANALYZE, BUFFERS) plans of slow or sampled queries.
+
+        sampler = SlowQuerySampler(threshold=0.5, sampleRate=0.001)
+        ag.addObserver(sampler)
+        ...
+        for plan in sampler.plans("MATCH (a:Person {name: %s})-[:KNOWS*1..3]->(b) RETURN b"):
+            print(plan)
+
+    A query is explained right after it executed when its execute time is at
+    least threshold seconds (None never), or at random with sampleRate. The
+    explain runs on the same connection inside a savepoint that is rolled
+    back (BEGIN/ROLLBACK in autocommit mode), so writes it repeats are undone;
+    sequence values it draws are not. Streamed queries only time the opening
+    of their cursor, so sample them with sampleRate.
+
+    Plans are kept per cypher template, the newest plansPerTemplate of each,
+    for the maxTemplates most recently captured templates.
+    """
+
+    def __init__(self, threshold:float=1.0, sampleRate:float=0.0, maxTemplates:int=100, plansPerTemplate:int=5,
+                 analyze:bool=True, buffers:bool=True, explainFormat:str="TEXT", rnd:random.Random=None):
+        explainFormat = explainFormat.upper()
+        if explainFormat not in ("TEXT", "JSON", "YAML", "XML"):
+            raise ValueError("unknown EXPLAIN format " + explainFormat)
+        self.threshold = threshold
+        self.sampleRate = sampleRate
+        self.maxTemplates = maxTemplates
+        self.plansPerTemplate = plansPerTemplate
+        self.random = rnd if rnd != None else random.Random()
+
+        options = []
+        if analyze:
+            options.append("ANALYZE")
+            if buffers:
+                options.append("BUFFERS")
+        options.append("FORMAT " + explainFormat)
+        self.explainPrefix = "EXPLAIN (" + ", ".join(options) + ") "
+        self.explainFormat = explainFormat
+
+        self._lock = threading.Lock()
+        self._plans = OrderedDict()     # template -> deque of QueryPlan
+        self.captured = 0
+        self.failed = 0
+
+    def afterExecute(self, event):
+        seconds = event.executeSeconds
+        if self.threshold != None and seconds >= self.threshold:
+            reason = SAMPLE_SLOW
+        elif self.sampleRate > 0 and self.random.random() < self.sampleRate:
+            reason = SAMPLE_RANDOM
+        else:
+            return
+        stmt = event.explainStmt()
+        if stmt == None or event.connection == None:
+            return
+        self.record(QueryPlan(event.cypherStmt, event.graphName, stmt, seconds, reason), event.connection)
+
+    # EXPLAIN plan.stmt on conn and store the result (or the error) in plan.
+    def record(self, plan:QueryPlan, conn:ext.connection) -> QueryPlan:
+        if conn.get_transaction_status() == ext.TRANSACTION_STATUS_INERROR:
+            return None
+        try:
+            plan.plan = self.explain(conn, plan.stmt)
+        except Exception as cause:
+            plan.error = cause
+
+        with self._lock:
+            if plan.error != None:
+                self.failed += 1
+            else:
+                self.captured += 1
+            plans = self._plans.get(plan.template)
+            if plans == None:
+                plans = self._plans[plan.template] = deque(maxlen=self.plansPerTemplate)
+            else:
+                self._plans.move_to_end(plan.template)
+            plans.append(plan)
+            while len(self._plans) > self.maxTemplates:
+                self._plans.popitem(last=False)
+        return plan
+
+    def explain(self, conn:ext.connection, stmt:str):
+        with conn.cursor() as cursor:
+            if conn.autocommit:
+                cursor.execute("BEGIN")
+                try:
+                    cursor.execute(self.explainPrefix + stmt)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.execute("ROLLBACK")
+            else:
+                cursor.execute("SAVEPOINT " + EXPLAIN_SAVEPOINT)
+                try:
+                    cursor.execute(self.explainPrefix + stmt)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.execute("ROLLBACK TO SAVEPOINT " + EXPLAIN_SAVEPOINT + ";RELEASE SAVEPOINT " + EXPLAIN_SAVEPOINT)
+        if self.explainFormat == "TEXT":
+            return "\n".join(row[0] for row in rows)
+        return rows[0][0]
+
+    # Captured plans of one template, oldest first, or of all templates.
+    def plans(self, template:str=None) -> list:
+        with self._lock:
+            if template != None:
+                return list(self._plans.get(template, ()))
+            return [plan for plans in self._plans.values() for plan in plans]
+
+    def templates(self) -> list:
+        with self._lock:
+            return list(self._plans)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"captured": self.captured, "failed": self.failed, "templates": len(self._plans)}
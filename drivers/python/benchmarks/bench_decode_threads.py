@@ -0,0 +1,110 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Decoding throughput with several threads decoding at once.
+#
+#   python benchmarks/bench_decode_threads.py --rows 20000 --threads 1 2 4 8
+#
+# Every thread decodes the same rows with parseAgeValue (one decoder per
+# thread) and the results are checked against a single threaded decode.
+# '--shared-antlr' instead shares one Antlr4ResultHandler between all threads,
+# the way the old module global handler was used, and counts wrong results.
+# Pure python decoding holds the GIL, so on a standard CPython build the
+# aggregate rate stays roughly flat; it scales on a free-threaded build.
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import age
+from age.builder import Antlr4ResultHandler
+
+VERTEX = '{"id": %d, "label": "Person", "properties": {"name": "Person%d", "age": %d, "score": 3.25, "tags": ["a", "b"]}}::vertex'
+EDGE = '{"id": %d, "label": "knows", "end_id": %d, "start_id": %d, "properties": {"since": %d}}::edge'
+
+
+def makeRows(count:int) -> list:
+    rows = []
+    for i in range(count):
+        if i % 3 == 2:
+            rows.append("[" + VERTEX % (i, i, i % 90) + ", " + EDGE % (i + 1, i, i + 2, 2000 + i % 20) + ", " +
+                        VERTEX % (i + 2, i + 2, i % 70) + "]::path")
+        elif i % 3 == 1:
+            rows.append(EDGE % (i, i + 1, i + 2, 2000 + i % 20))
+        else:
+            rows.append(VERTEX % (i, i, i % 90))
+    return rows
+
+
+def decodeAll(parse, rows:list) -> list:
+    return [parse(row) for row in rows]
+
+
+def run(rows:list, threads:int, parseFactory, expected:list):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(lambda _: decodeAll(parseFactory(), rows), range(threads)))
+    seconds = time.perf_counter() - start
+
+    errors = 0
+    for result in results:
+        for got, want in zip(result, expected):
+            if str(got) != want:
+                errors += 1
+    return len(rows) * threads / seconds, errors
+
+
+def safeParse(parse):
+    def wrapper(value):
+        try:
+            return parse(value)
+        except Exception as ex:
+            return ex
+    return wrapper
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000, help='Rows decoded by each thread')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8], help='Thread counts to run')
+    parser.add_argument('--shared-antlr', action='store_true', help='Share one ANTLR handler between threads')
+    args = parser.parse_args()
+
+    rows = makeRows(args.rows)
+    expected = [str(v) for v in decodeAll(age.parseAgeValue, rows)]
+
+    if args.shared_antlr:
+        shared = Antlr4ResultHandler(None)
+        shared.lexer.removeErrorListeners()
+        shared.parser.removeErrorListeners()
+        parseFactory = lambda: safeParse(shared.parse)
+        name = "shared Antlr4ResultHandler"
+    else:
+        parseFactory = lambda: age.parseAgeValue
+        name = "parseAgeValue (per thread decoder)"
+
+    print("%s, %d rows per thread, gil %s" % (name, args.rows,
+          "enabled" if getattr(sys, "_is_gil_enabled", lambda: True)() else "disabled"))
+    print("%8s %14s %10s %8s" % ("threads", "rows/s", "speedup", "errors"))
+    base = None
+    for threads in args.threads:
+        rate, errors = run(rows, threads, parseFactory, expected)
+        if base == None:
+            base = rate
+        print("%8d %14.0f %9.2fx %8d" % (threads, rate, rate / base, errors))
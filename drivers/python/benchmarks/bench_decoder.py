@@ -0,0 +1,214 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Offline agtype decoder benchmarks, no database needed.
+#
+#   python benchmarks/bench_decoder.py                   # run and compare with decoder_baseline.json
+#   python benchmarks/bench_decoder.py --save-baseline   # record a new baseline
+#   python benchmarks/bench_decoder.py --decoders fast --corpora wide_maps paths
+#
+# Every decoder decodes every synthetic corpus. Reported are cells/s, MB/s of
+# agtype text and the peak memory of holding the decoded corpus (tracemalloc,
+# measured in a separate pass so it does not slow the timed ones).
+#
+# Rates are also stored relative to a fixed pure python calibration loop run
+# on the same machine, so a baseline recorded on one machine is still a
+# useful reference on another. The comparison uses the relative rates and
+# exits with status 1 when one drops more than --tolerance below the baseline.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from age.decoder import AgtypeDecoder
+from age.builder import Antlr4ResultHandler
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "decoder_baseline.json")
+
+
+# Corpora: lists of agtype text cells, generated from a fixed seed.
+
+def vertexText(vid:int, props:dict) -> str:
+    return '{"id": %d, "label": "Person", "properties": %s}::vertex' % (vid, json.dumps(props))
+
+
+def edgeText(rnd, eid:int, start:int, end:int) -> str:
+    return '{"id": %d, "label": "knows", "end_id": %d, "start_id": %d, "properties": {"since": %d}}::edge' % \
+        (eid, end, start, rnd.randint(1990, 2024))
+
+
+def scalars(rnd, count:int) -> list:
+    choices = [lambda: str(rnd.randint(-10**9, 10**9)), lambda: repr(rnd.random() * 1000),
+               lambda: json.dumps("name %d" % rnd.randint(0, 10**6)), lambda: "true", lambda: "null"]
+    return [rnd.choice(choices)() for _ in range(count)]
+
+
+def wideMaps(rnd, count:int) -> list:
+    cells = []
+    for i in range(count):
+        props = dict(("p%d" % k, rnd.choice([k, k * 0.5, "value %d" % k, None, True])) for k in range(50))
+        cells.append(vertexText(i, props))
+    return cells
+
+
+def deepNesting(rnd, count:int) -> list:
+    cells = []
+    for i in range(count):
+        value = {"leaf": i}
+        for depth in range(12):
+            value = {"d": depth, "child": value} if depth % 2 else [depth, value]
+        cells.append(json.dumps(value))
+    return cells
+
+
+def paths(rnd, count:int) -> list:
+    cells = []
+    for i in range(count):
+        parts = []
+        for hop in range(10):
+            parts.append(vertexText(hop, {"name": "v%d" % hop, "rank": hop}))
+            parts.append(edgeText(rnd, 1000 + hop, hop, hop + 1))
+        parts.append(vertexText(10, {"name": "v10", "rank": 10}))
+        cells.append("[" + ", ".join(parts) + "]::path")
+    return cells
+
+
+def numerics(rnd, count:int) -> list:
+    return ['{"amount": %d.%02d::numeric, "rate": %s, "qty": %d}' %
+            (rnd.randint(0, 10**12), rnd.randint(0, 99), repr(rnd.random()), rnd.randint(0, 1000)) for _ in range(count)]
+
+
+CORPORA = {
+    "scalars": (scalars, 20000),
+    "wide_maps": (wideMaps, 1000),
+    "deep_nesting": (deepNesting, 2000),
+    "paths": (paths, 500),
+    "numerics": (numerics, 10000),
+}
+
+# Decoder factories and the most cells each decodes per corpus. The ANTLR
+# handler is orders of magnitude slower (and exponential in nesting depth,
+# which is why deep_nesting stops at 12 levels), so it gets a short prefix.
+DECODERS = {
+    "fast": (lambda: AgtypeDecoder(None).parse, None),
+    "scanner": (lambda: AgtypeDecoder(None, jsonFastPath=False).parse, None),
+    "lazy": (lambda: AgtypeDecoder(None, lazyProperties=True).parse, None),
+    "antlr": (lambda: Antlr4ResultHandler(None).parse, 50),
+}
+
+
+def calibrate(seconds:float=0.3) -> float:
+    # Fixed pure python work, in loops per second.
+    loops = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        d = {}
+        for i in range(1000):
+            d["k%d" % (i % 50)] = [i, str(i)]
+        loops += 1
+    return loops / (time.perf_counter() - start)
+
+
+def runOne(parse, cells:list, minSeconds:float) -> dict:
+    size = sum(len(c) for c in cells)
+
+    tracemalloc.start()
+    decoded = [parse(cell) for cell in cells]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del decoded
+
+    best = None
+    total = 0.0
+    while total < minSeconds or best == None:
+        start = time.perf_counter()
+        for cell in cells:
+            parse(cell)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        best = elapsed if best == None else min(best, elapsed)
+
+    return {"cells_per_sec": len(cells) / best, "mb_per_sec": size / best / 1e6, "peak_kb": peak / 1024.0}
+
+
+def run(decoders:list, corpora:list, scale:float, minSeconds:float) -> dict:
+    results = {}
+    for corpus in corpora:
+        generate, count = CORPORA[corpus]
+        cells = generate(random.Random(42), max(1, int(count * scale)))
+        for name in decoders:
+            factory, maxCells = DECODERS[name]
+            key = corpus + "/" + name
+            results[key] = runOne(factory(), cells[:maxCells], minSeconds)
+            print("  " + key, file=sys.stderr, flush=True)
+    return results
+
+
+def compare(results:dict, calibration:float, baseline:dict, tolerance:float) -> list:
+    regressions = []
+    base = baseline["results"]
+    print("\n%-24s %12s %12s %8s" % ("vs baseline", "relative", "baseline", "change"))
+    for key, result in results.items():
+        if key not in base:
+            continue
+        relative = result["cells_per_sec"] / calibration
+        baseRelative = base[key]["relative"]
+        change = relative / baseRelative - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print("%-24s %12.4f %12.4f %+7.1f%%%s" % (key, relative, baseRelative, change * 100, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--decoders', nargs='+', default=list(DECODERS), choices=list(DECODERS))
+    parser.add_argument('--corpora', nargs='+', default=list(CORPORA), choices=list(CORPORA))
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the corpus sizes')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='Minimum timed seconds per case')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown, 0.2 = 20%%')
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    results = run(args.decoders, args.corpora, args.scale, args.min_seconds)
+
+    print("python %s, calibration %.1f loops/s" % (sys.version.split()[0], calibration))
+    print("%-24s %14s %10s %10s" % ("corpus/decoder", "cells/s", "MB/s", "peak KB"))
+    for key, result in results.items():
+        print("%-24s %14.0f %10.2f %10.1f" % (key, result["cells_per_sec"], result["mb_per_sec"], result["peak_kb"]))
+
+    if args.save_baseline:
+        for result in results.values():
+            result["relative"] = result["cells_per_sec"] / calibration
+        with open(args.baseline, "w") as f:
+            json.dump({"python": sys.version.split()[0], "calibration": calibration, "scale": args.scale,
+                       "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("\nBaseline written to " + args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, calibration, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,290 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# End to end query latency against a PostgreSQL server with AGE.
+#
+#   python benchmarks/bench_e2e.py --dsn "host=localhost dbname=postgres user=postgres"
+#   python benchmarks/bench_e2e.py --docker                  # image built from docker/Dockerfile
+#   python benchmarks/bench_e2e.py --pg-bin /usr/local/pgsql/bin   # throwaway local cluster
+#
+# A graph of --vertices Person vertices with --degree KNOWS edges each is bulk
+# loaded, then every query shape runs --iterations times through
+# Age.execCypher (or Age.cypher with --api cypher). Reported per shape are the
+# p50/p99 latency and rows/s of the full call plus fetchall, and the median
+# split of one call into
+#
+#   server    Planning + Execution Time of EXPLAIN (ANALYZE) of the same query
+#   transfer  fetching the rows as undecoded agtype text, minus server time
+#             (network, result serialization and libpq)
+#   decode    decoding that text with the connection's result handler
+#
+# The split is measured with separate executions of the query, so it does not
+# add up to the end to end latency exactly. Query shapes must be read only:
+# EXPLAIN ANALYZE runs them.
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import psycopg2
+import age
+from age.age import buildPreparedCypher, buildInlineCypher, resultHandlerFor, _agtypeOids
+from age.builder import decodeAgeValue
+from age.parallel import registerRawAgtype
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+DOCKER_IMAGE = "age-bench"
+DOCKER_PASSWORD = "agens"
+
+# name -> (cypher with {uid} for a random start vertex, result columns)
+SHAPES = {
+    "point": ("MATCH (n:Person {uid: {uid}}) RETURN n", ["n"]),
+    "expand": ("MATCH (a:Person {uid: {uid}})-[e:KNOWS]->(b:Person) RETURN e, b", ["e", "b"]),
+    "two_hop": ("MATCH p=(a:Person {uid: {uid}})-[:KNOWS]->()-[:KNOWS]->() RETURN p", ["p"]),
+    "scan": ("MATCH (n:Person) RETURN n LIMIT 1000", ["n"]),
+    "props": ("MATCH (n:Person) WHERE n.age > 60 RETURN n.name, n.age, n.score", ["name", "age", "score"]),
+    "count": ("MATCH (:Person)-[e:KNOWS]->() RETURN count(e)", ["c"]),
+}
+
+
+# Server fixtures, each yields a DSN and stops the server afterwards.
+
+def waitForServer(dsn:str, seconds:float):
+    deadline = time.monotonic() + seconds
+    while True:
+        try:
+            psycopg2.connect(dsn).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+@contextmanager
+def dockerServer(port:int, keep:bool):
+    subprocess.run(["docker", "build", "-t", DOCKER_IMAGE, "-f", os.path.join(REPO_ROOT, "docker", "Dockerfile"), REPO_ROOT],
+                   check=True)
+    name = "age-bench-%d" % os.getpid()
+    subprocess.run(["docker", "run", "-d", "--name", name, "-p", "%d:5432" % port,
+                    "-e", "POSTGRES_PASSWORD=" + DOCKER_PASSWORD, DOCKER_IMAGE], check=True, stdout=subprocess.DEVNULL)
+    dsn = "host=127.0.0.1 port=%d dbname=postgres user=postgres password=%s" % (port, DOCKER_PASSWORD)
+    try:
+        # The entrypoint restarts the server after running the init scripts.
+        time.sleep(2)
+        waitForServer(dsn, 120)
+        yield dsn
+    finally:
+        if not keep:
+            subprocess.run(["docker", "rm", "-f", name], stdout=subprocess.DEVNULL)
+
+
+@contextmanager
+def localServer(pgBin:str, port:int, keep:bool):
+    dataDir = tempfile.mkdtemp(prefix="age-bench-")
+    subprocess.run([os.path.join(pgBin, "initdb"), "-D", dataDir, "-U", "postgres", "--auth=trust"],
+                   check=True, stdout=subprocess.DEVNULL)
+    options = "-p %d -k %s -c shared_preload_libraries=age" % (port, dataDir)
+    subprocess.run([os.path.join(pgBin, "pg_ctl"), "-D", dataDir, "-o", options, "-l", os.path.join(dataDir, "server.log"),
+                    "-w", "start"], check=True, stdout=subprocess.DEVNULL)
+    dsn = "host=%s port=%d dbname=postgres user=postgres" % (dataDir, port)
+    try:
+        conn = psycopg2.connect(dsn)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS age")
+        conn.close()
+        yield dsn
+    finally:
+        if not keep:
+            subprocess.run([os.path.join(pgBin, "pg_ctl"), "-D", dataDir, "-m", "fast", "stop"], stdout=subprocess.DEVNULL)
+            shutil.rmtree(dataDir, ignore_errors=True)
+
+
+@contextmanager
+def existingServer(dsn:str):
+    yield dsn
+
+
+# Graph generation
+
+def loadGraph(ag, vertices:int, degree:int, seed:int):
+    rnd = random.Random(seed)
+    people = ({"uid": i, "name": "Person%d" % i, "age": rnd.randint(18, 90), "score": rnd.random()}
+              for i in range(vertices))
+    result = ag.bulkLoadVertices("Person", people)
+    print("  %s" % result, file=sys.stderr)
+
+    knows = ((i, rnd.randrange(vertices), {"since": rnd.randint(1990, 2024)})
+             for i in range(vertices) for _ in range(degree))
+    result = ag.bulkLoadEdges("KNOWS", knows, ("Person", "uid"), ("Person", "uid"))
+    print("  %s" % result, file=sys.stderr)
+
+    with ag.connection.cursor() as cursor:
+        cursor.execute('CREATE INDEX ON "%s"."Person" USING gin (properties)' % ag.graphName)
+        cursor.execute('CREATE INDEX ON "%s"."KNOWS" (start_id)' % ag.graphName)
+        cursor.execute('ANALYZE "%s"."Person"' % ag.graphName)
+        cursor.execute('ANALYZE "%s"."KNOWS"' % ag.graphName)
+    ag.commit()
+
+
+# Measurements
+
+def percentile(values:list, p:float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def timeEndToEnd(ag, stmt:str, cols:list, api:str) -> tuple:
+    start = time.perf_counter()
+    if api == "cypher":
+        # cypher() runs on the cursor it is given and only returns one with cypherParams.
+        cursor = ag.connection.cursor()
+        ag.cypher(cursor, stmt, cols=cols)
+    else:
+        cursor = ag.execCypher(stmt, cols=cols)
+    rows = cursor.fetchall()
+    seconds = time.perf_counter() - start
+    cursor.close()
+    return seconds, len(rows)
+
+
+def timeBreakdown(ag, stmt:str, cols:list) -> tuple:
+    conn = ag.connection
+
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + buildInlineCypher(conn, ag.graphName, stmt, cols))
+        plan = cursor.fetchone()[0][0]
+    server = (plan["Planning Time"] + plan["Execution Time"]) / 1000.0
+
+    with conn.cursor() as cursor:
+        registerRawAgtype(cursor, _agtypeOids[conn])
+        start = time.perf_counter()
+        cursor.execute(buildPreparedCypher(conn, ag.graphName, stmt, cols))
+        raw = cursor.fetchall()
+        fetched = time.perf_counter() - start
+
+    handler = resultHandlerFor(conn)
+    start = time.perf_counter()
+    for row in raw:
+        for value in row:
+            decodeAgeValue(handler, value)
+    decode = time.perf_counter() - start
+
+    return server, max(0.0, fetched - server), decode, sum(len(v) for row in raw for v in row if v != None)
+
+
+def runShape(ag, name:str, iterations:int, warmup:int, vertices:int, api:str, rnd) -> dict:
+    template, cols = SHAPES[name]
+    latencies = []
+    rows = 0
+    servers, transfers, decodes, sizes = [], [], [], []
+    for i in range(warmup + iterations):
+        stmt = template.replace("{uid}", str(rnd.randrange(vertices)))
+        seconds, count = timeEndToEnd(ag, stmt, cols, api)
+        server, transfer, decode, size = timeBreakdown(ag, stmt, cols)
+        ag.rollback()
+        if i < warmup:
+            continue
+        latencies.append(seconds)
+        rows += count
+        servers.append(server)
+        transfers.append(transfer)
+        decodes.append(decode)
+        sizes.append(size)
+
+    return {
+        "rows_per_query": rows / float(iterations),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rows_per_sec": rows / sum(latencies),
+        "server_ms": percentile(servers, 50) * 1000,
+        "transfer_ms": percentile(transfers, 50) * 1000,
+        "decode_ms": percentile(decodes, 50) * 1000,
+        "kb_per_query": percentile(sizes, 50) / 1024.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    server = parser.add_mutually_exclusive_group(required=True)
+    server.add_argument('--dsn', help='Use a running server that has the age extension installed')
+    server.add_argument('--docker', action='store_true', help='Build and run the image from docker/Dockerfile')
+    server.add_argument('--pg-bin', help='Start a temporary cluster with the initdb/pg_ctl in this directory')
+    parser.add_argument('--port', type=int, default=55432, help='Port for --docker and --pg-bin')
+    parser.add_argument('--keep', action='store_true', help='Leave the --docker/--pg-bin server and the graph in place')
+    parser.add_argument('--graph', default="bench_graph")
+    parser.add_argument('--vertices', type=int, default=10000)
+    parser.add_argument('--degree', type=int, default=5, help='KNOWS edges per vertex')
+    parser.add_argument('--shapes', nargs='+', default=list(SHAPES), choices=list(SHAPES))
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--api', default="execCypher", choices=["execCypher", "cypher"])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    if args.docker:
+        fixture = dockerServer(args.port, args.keep)
+    elif args.pg_bin != None:
+        fixture = localServer(args.pg_bin, args.port, args.keep)
+    else:
+        fixture = existingServer(args.dsn)
+
+    with fixture as dsn:
+        ag = age.connect(dsn=dsn)
+        # Keep the search_path set by connect when dropping a missing graph rolls back.
+        ag.commit()
+        try:
+            age.deleteGraph(ag.connection, args.graph)
+        except Exception:
+            ag.rollback()
+        ag.setGraph(args.graph)
+
+        try:
+            print("loading %d vertices, %d edges" % (args.vertices, args.vertices * args.degree), file=sys.stderr)
+            loadGraph(ag, args.vertices, args.degree, args.seed)
+
+            rnd = random.Random(args.seed)
+            results = {}
+            for name in args.shapes:
+                results[name] = runShape(ag, name, args.iterations, args.warmup, args.vertices, args.api, rnd)
+        finally:
+            if not args.keep:
+                age.deleteGraph(ag.connection, args.graph)
+            ag.close()
+
+    print("%s, %d vertices, degree %d, %d iterations" % (args.api, args.vertices, args.degree, args.iterations))
+    print("%-8s %8s %9s %9s %11s %10s %11s %10s %9s" % ("shape", "rows", "p50 ms", "p99 ms", "rows/s",
+          "server ms", "transfer ms", "decode ms", "KB"))
+    for name, result in results.items():
+        print("%-8s %8.1f %9.2f %9.2f %11.0f %10.2f %11.2f %10.2f %9.1f" % (name, result["rows_per_query"],
+              result["p50_ms"], result["p99_ms"], result["rows_per_sec"], result["server_ms"], result["transfer_ms"],
+              result["decode_ms"], result["kb_per_query"]))
+
+    if args.json != None:
+        with open(args.json, "w") as f:
+            json.dump({"api": args.api, "vertices": args.vertices, "degree": args.degree,
+                       "iterations": args.iterations, "version": age.version(), "results": results}, f, indent=2)
+            f.write("\n")
@@ -0,0 +1,85 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+# Memory held by Vertex/Edge objects, slotted model classes against the
+# previous __dict__ based ones.
+#
+#   python benchmarks/bench_model_memory.py --count 1000000
+#
+# Property dicts are shared between the objects so only the per object
+# overhead is measured.
+
+import os
+import sys
+import gc
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from age.models import Vertex, Edge
+
+
+# Shape of the model classes before __slots__.
+class DictVertex:
+    def __init__(self, id=None, label=None, properties=None) -> None:
+        self.id = id
+        self.label = label
+        self.properties = properties
+
+
+class DictEdge:
+    def __init__(self, id=None, label=None, properties=None) -> None:
+        self.id = id
+        self.label = label
+        self.start_id = None
+        self.end_id = None
+        self.properties = properties
+
+
+def measure(factory, count:int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    objs = [factory(i) for i in range(count)]
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return size / count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200000, help='Objects created per class')
+    args = parser.parse_args()
+
+    props = {"name": "Person", "age": 30}
+
+    def dictEdge(i):
+        edge = DictEdge(i, "knows", props)
+        edge.start_id = i
+        edge.end_id = i + 1
+        return edge
+
+    cases = [
+        ("Vertex", lambda i: DictVertex(i, "Person", props), lambda i: Vertex(i, "Person", props)),
+        ("Edge", dictEdge, lambda i: Edge(i, "knows", props, i, i + 1)),
+    ]
+
+    print("%d objects per class, bytes per object (including the list slot and the int id)" % args.count)
+    print("%8s %10s %10s %8s" % ("class", "__dict__", "__slots__", "saved"))
+    for name, old, new in cases:
+        oldSize = measure(old, args.count)
+        newSize = measure(new, args.count)
+        print("%8s %10.1f %10.1f %7.0f%%" % (name, oldSize, newSize, 100 * (oldSize - newSize) / oldSize))
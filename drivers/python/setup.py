@@ -31,6 +31,7 @@ setup(
     download_url     = 'https://github.com/apache/age/releases' ,
     license          = 'Apache2.0',
     install_requires = [ 'psycopg2', 'antlr4_python3_runtime==4.11.1'],
+    extras_require   = { 'aio': ['psycopg>=3.1'] },
     packages         = ['age', 'age.gen'],
     keywords         = ['Graph Database', 'Apache AGE', 'PostgreSQL'],
     python_requires  = '>=3.9',
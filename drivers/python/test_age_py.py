@@ -374,6 +374,515 @@ class TestAgeBasic(unittest.TestCase):
             self.assertFalse(as_str.endswith(", }}::VERTEX"))
         print("Vertex.toString() 'properties' field is formatted properly.")
 
+    def testPreparedCache(self):
+
+        print("\n---------------------------------------------")
+        print("Test 8: Testing Prepared Statement Cache.....")
+        print("---------------------------------------------\n")
+
+        ag = self.ag
+        for name in ['Joe', 'Jack', 'Andy']:
+            ag.execCypherPrepared("CREATE (n:Person {name: $name}) RETURN n", params={'name': name})
+        ag.commit()
+
+        self.assertEqual(1, ag.statementCache.misses)
+        self.assertEqual(2, ag.statementCache.hits)
+
+        cursor = ag.execCypherPrepared("MATCH (n:Person) WHERE n.name = $name RETURN n.name", params={'name': 'Andy'})
+        self.assertEqual('Andy', cursor.fetchone()[0])
+
+        cursor = ag.execCypherPrepared("MATCH (n:Person) WHERE n.name = $name RETURN n.name", params={'name': 'Jack'})
+        self.assertEqual('Jack', cursor.fetchone()[0])
+        self.assertEqual(2, len(ag.statementCache))
+
+        # A failing EXECUTE keeps its prepared statement, which is reused rather than prepared again.
+        with self.assertRaises(age.SqlExecutionError):
+            ag.execCypherPrepared("RETURN 1 / $d", params={'d': 0})
+        misses = ag.statementCache.misses
+        self.assertEqual(1, ag.execCypherPrepared("RETURN 1 / $d", params={'d': 1}).fetchone()[0])
+        self.assertEqual(misses, ag.statementCache.misses)
+
+        # A failing PREPARE leaves nothing behind.
+        with self.assertRaises(Exception):
+            ag.execCypherPrepared("RETURN $x +", params={'x': 1})
+        with ag.connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_prepared_statements")
+            self.assertEqual(len(ag.statementCache), cursor.fetchone()[0])
+        ag.commit()
+
+        print("\nTest 8 Successful...")
+
+    def testCypherParams(self):
+
+        print("\n-----------------------------------------")
+        print("Test 9: Testing agtype Cypher Parameters.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        with ag.connection.cursor() as cursor:
+            ag.cypher(cursor, "CREATE (n:Person {name: $name, tags: $tags}) ", cypherParams={'name': 'J\u00f6rg', 'tags': ['a', 'b']})
+            ag.cypher(cursor, "CREATE (n:Person {name: $name, tags: $tags}) ", cypherParams={'name': "O'Brien", 'tags': []})
+        ag.commit()
+
+        cursor = ag.execCypher("MATCH (n:Person {name: $name}) RETURN n", cypherParams={'name': 'J\u00f6rg'})
+        vertex = cursor.fetchone()[0]
+        self.assertEqual('J\u00f6rg', vertex['name'])
+        self.assertEqual(['a', 'b'], vertex['tags'])
+
+        cursor = ag.execCypher("MATCH (n:Person {name: $name}) RETURN n.name", cypherParams={'name': "O'Brien"})
+        self.assertEqual("O'Brien", cursor.fetchone()[0])
+
+        with self.assertRaises(ValueError):
+            ag.execCypher("MATCH (n:Person {name: $name}) RETURN n", params=('x',), cypherParams={'name': 'x'})
+
+        print("\nTest 9 Successful...")
+
+    def testBulkLoadVertices(self):
+
+        print("\n-------------------------------------")
+        print("Test 10: Testing Bulk Vertex Load.....")
+        print("-------------------------------------\n")
+
+        ag = self.ag
+        rows = ({'name': 'Person' + str(i), 'seq': i, 'note': 'tab\there \\ back'} for i in range(1000))
+        result = ag.bulkLoadVertices('Person', rows)
+        ag.commit()
+        print(result)
+        self.assertEqual(1000, result.rows)
+
+        cursor = ag.execCypher("MATCH (n:Person) RETURN count(n)")
+        self.assertEqual(1000, cursor.fetchone()[0])
+
+        cursor = ag.execCypher("MATCH (n:Person {seq: 7}) RETURN n")
+        vertex = cursor.fetchone()[0]
+        self.assertEqual('Person', vertex.label)
+        self.assertEqual('Person7', vertex['name'])
+        self.assertEqual('tab\there \\ back', vertex['note'])
+
+        # Loaded vertices get ids from the label sequence, like CREATE.
+        cursor = ag.execCypher("CREATE (n:Person {name: 'Extra'}) RETURN n")
+        self.assertNotEqual(vertex.id, cursor.fetchone()[0].id)
+        ag.commit()
+
+        print("\nTest 10 Successful...")
+
+    def testBulkLoadEdges(self):
+
+        print("\n-----------------------------------")
+        print("Test 11: Testing Bulk Edge Load.....")
+        print("-----------------------------------\n")
+
+        ag = self.ag
+        ag.bulkLoadVertices('Person', ({'name': 'Person' + str(i)} for i in range(100)))
+        ag.bulkLoadVertices('Country', [{'code': 1}, {'code': 2}])
+
+        rows = (('Person' + str(i), 'Person' + str((i + 1) % 100), {'weight': i}) for i in range(100))
+        result = ag.bulkLoadEdges('knows', rows, startKey=('Person', 'name'), endKey=('Person', 'name'), batchSize=30)
+        self.assertEqual(100, result.rows)
+
+        rows = (('Person' + str(i), i % 2 + 1) for i in range(100))
+        result = ag.bulkLoadEdges('livesIn', rows, startKey=('Person', 'name'), endKey=('Country', 'code'))
+        self.assertEqual(100, result.rows)
+        ag.commit()
+
+        cursor = ag.execCypher("MATCH (a:Person {name: 'Person99'})-[e:knows]->(b) RETURN e.weight, b.name", cols=['w', 'n'])
+        row = cursor.fetchone()
+        self.assertEqual(99, row[0])
+        self.assertEqual('Person0', row[1])
+
+        cursor = ag.execCypher("MATCH (:Person)-[:livesIn]->(c:Country {code: 2}) RETURN count(*)")
+        self.assertEqual(50, cursor.fetchone()[0])
+
+        with self.assertRaises(ValueError):
+            ag.bulkLoadEdges('knows', [('Person1', 'Nobody')], startKey=('Person', 'name'), endKey=('Person', 'name'))
+
+        print("\nTest 11 Successful...")
+
+    def testExecBatch(self):
+
+        print("\n------------------------------------")
+        print("Test 12: Testing Batched UNWIND.....")
+        print("------------------------------------\n")
+
+        ag = self.ag
+        rows = ({'name': 'Person' + str(i % 50), 'seq': i} for i in range(120))
+        results = ag.execBatch("MERGE (n:Person {name: row.name}) SET n.seq = row.seq RETURN n", rows, batchSize=50)
+        ag.commit()
+        self.assertEqual([50, 50, 20], [r.rows for r in results])
+        self.assertEqual([50, 50, 20], [r.rowcount for r in results])
+
+        cursor = ag.execCypher("MATCH (n:Person) RETURN count(n)")
+        self.assertEqual(50, cursor.fetchone()[0])
+
+        # The second batch fails on a division by zero and is rolled back alone.
+        rows = [{'name': 'A', 'd': 1}, {'name': 'B', 'd': 0}, {'name': 'C', 'd': 1}]
+        results = ag.execBatch("CREATE (n:Other {name: row.name, v: 1 / row.d})", rows, batchSize=1, stopOnError=False)
+        ag.commit()
+        self.assertEqual([True, False, True], [r.ok for r in results])
+
+        cursor = ag.execCypher("MATCH (n:Other) RETURN count(n)")
+        self.assertEqual(2, cursor.fetchone()[0])
+
+        print("\nTest 12 Successful...")
+
+    def testStream(self):
+
+        print("\n-----------------------------------------")
+        print("Test 13: Testing Streaming Results.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        ag.bulkLoadVertices('Person', ({'name': 'Person' + str(i), 'seq': i} for i in range(1000)))
+        ag.commit()
+
+        cursor = ag.execCypher("MATCH (n:Person) WHERE n.seq >= %s RETURN n ORDER BY n.seq", params=(10,), stream=True, itersize=100)
+        self.assertIsNotNone(cursor.name)
+        count = 0
+        for row in cursor:
+            self.assertEqual(count + 10, row[0]['seq'])
+            count += 1
+        cursor.close()
+        self.assertEqual(990, count)
+
+        with self.assertRaises(ValueError):
+            ag.execCypher("MATCH (n:Person) RETURN n", cypherParams={}, stream=True)
+        ag.commit()
+
+        print("\nTest 13 Successful...")
+
+    def testPool(self):
+
+        print("\n-----------------------------------------")
+        print("Test 15: Testing Connection Pool.....")
+        print("-----------------------------------------\n")
+
+        import threading
+
+        pool = age.AgePool(minSize=1, maxSize=3, maxUses=5, timeout=10, graph=TEST_GRAPH_NAME,
+                           host=TEST_HOST, port=TEST_PORT, dbname=TEST_DB, user=TEST_USER, password=TEST_PASSWORD)
+        self.assertEqual(1, pool.stats()['opened'])
+
+        errors = []
+        def worker(n):
+            try:
+                for i in range(10):
+                    with pool.connection() as ag:
+                        ag.execCypher("CREATE (n:Person {worker: %s, seq: %s})", params=(n, i))
+                        ag.commit()
+            except Exception as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([], errors)
+        self.assertLessEqual(pool.stats()['opened'], 3)
+
+        # Uncommitted work is rolled back when the connection is returned.
+        with pool.connection() as ag:
+            ag.execCypher("CREATE (n:Person {worker: -1})")
+        with pool.connection() as ag:
+            cursor = ag.execCypher("MATCH (n:Person) RETURN count(n)")
+            self.assertEqual(60, cursor.fetchone()[0])
+
+        # A connection can only be returned once.
+        ag = pool.getconn()
+        pool.putconn(ag)
+        with self.assertRaises(age.PoolError):
+            pool.putconn(ag)
+
+        # Closed connections are replaced on the next borrow.
+        with pool.connection() as ag:
+            ag.connection.close()
+        with pool.connection() as ag:
+            self.assertFalse(ag.connection.closed)
+
+        pool.close()
+        with self.assertRaises(age.PoolError):
+            pool.getconn()
+
+        print("\nTest 15 Successful...")
+
+    def testParallelDecode(self):
+
+        print("\n-----------------------------------------")
+        print("Test 16: Testing Parallel Decoding.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        ag.bulkLoadVertices('Person', ({'name': 'Person' + str(i), 'seq': i} for i in range(2000)))
+        ag.commit()
+
+        count = 0
+        for row in ag.execCypherParallel("MATCH (n:Person) RETURN n, n.seq ORDER BY n.seq", cols=['n', 'seq'],
+                                         chunkSize=300, workers=2):
+            self.assertEqual(age.TP_VERTEX, row[0].gtype)
+            self.assertEqual(count, row[0]['seq'])
+            self.assertEqual(count, row[1])
+            count += 1
+        self.assertEqual(2000, count)
+        ag.commit()
+
+        print("\nTest 16 Successful...")
+
+    def testIdentityMap(self):
+
+        print("\n-----------------------------------------")
+        print("Test 17: Testing Identity Map.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        ag.execCypher("CREATE (h:Person {name: 'Hub'})")
+        ag.execCypher("MATCH (h:Person {name: 'Hub'}) UNWIND range(1, 20) AS i CREATE (h)-[:knows]->(:Person {seq: i})")
+        ag.commit()
+
+        identityMap = age.IdentityMap()
+        cursor = ag.execCypher("MATCH p=(h:Person {name: 'Hub'})-[:knows]->(n) RETURN p", identityMap=identityMap)
+        rows = cursor.fetchall()
+        self.assertEqual(20, len(rows))
+        hubs = set(id(row[0][0]) for row in rows)
+        self.assertEqual(1, len(hubs))
+        self.assertEqual(41, len(identityMap))
+
+        # Without a map every row builds its own hub vertex.
+        cursor = ag.execCypher("MATCH p=(h:Person {name: 'Hub'})-[:knows]->(n) RETURN p")
+        self.assertEqual(20, len(set(id(row[0][0]) for row in cursor.fetchall())))
+        ag.commit()
+
+        print("\nTest 17 Successful...")
+
+    def testToGraph(self):
+
+        print("\n-----------------------------------------")
+        print("Test 18: Testing Result to Graph.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        ag.execCypher("CREATE (:Person {name: 'Andy'})-[:knows]->(:Person {name: 'Jack'})-[:knows]->(:Person {name: 'Smith'})")
+        ag.commit()
+
+        graph = ag.execCypher("MATCH p=(a:Person)-[:knows*1..2]->(b:Person) RETURN p").toGraph()
+        self.assertEqual(3, len(graph))
+        self.assertEqual(3, len(graph.vertices))
+        self.assertEqual(2, len(graph.edges))
+
+        names = dict((v['name'], v.id) for v in graph.vertices.values())
+        self.assertEqual([names['Jack']], graph.neighbors(names['Andy'], "out"))
+        self.assertEqual(sorted([names['Andy'], names['Smith']]), sorted(graph.neighbors(names['Jack'])))
+        ag.commit()
+
+        print("\nTest 18 Successful...")
+
+    def testColumnar(self):
+
+        print("\n-----------------------------------------")
+        print("Test 19: Testing Columnar Results.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        ag.bulkLoadVertices('Person', ({'name': 'Person' + str(i), 'age': i % 50, 'score': i / 4} for i in range(100)))
+        ag.bulkLoadVertices('Person', [{'name': 'Nobody'}])
+        ag.commit()
+
+        result = ag.execCypherColumnar("MATCH (n:Person) RETURN n ORDER BY id(n)", props=['age', 'score'], chunkSize=30)
+        self.assertEqual(101, len(result))
+        self.assertEqual('q', result.ids.values.typecode)
+        self.assertEqual(['Person'], result.labels.categories)
+        self.assertEqual('q', result['age'].values.typecode)
+        self.assertEqual('d', result['score'].values.typecode)
+        self.assertEqual(1, result['age'].nullCount())
+        self.assertEqual(49, result['age'].values[49])
+
+        result = ag.execCypherColumnar("MATCH (n:Person) RETURN n.age, n.name", cols=['age', 'name'])
+        self.assertEqual(['age', 'name'], list(result.columns))
+        self.assertEqual('object', result['name'].kind)
+        ag.commit()
+
+        print("\nTest 19 Successful...")
+
+    def testNdjson(self):
+
+        print("\n-----------------------------------------")
+        print("Test 20: Testing NDJSON Export.....")
+        print("-----------------------------------------\n")
+
+        import io
+
+        ag = self.ag
+        ag.execCypher("CREATE (:Person {name: 'Andy', age: 30, score: 1.5, tags: ['a']})-[:knows {since: 2020}]->(:Person {name: 'Jack'})")
+        ag.commit()
+
+        out = io.StringIO()
+        count = ag.execCypherNdjson("MATCH (a:Person)-[e:knows]->(b:Person) RETURN a, e, b.name", out, cols=['a', 'e', 'name'])
+        self.assertEqual(1, count)
+        row = json.loads(out.getvalue().splitlines()[0])
+        self.assertEqual(30, row['a']['properties']['age'])
+        self.assertEqual(1.5, row['a']['properties']['score'])
+        self.assertEqual(['a'], row['a']['properties']['tags'])
+        self.assertEqual(2020, row['e']['properties']['since'])
+        self.assertEqual(row['a']['id'], row['e']['start_id'])
+        self.assertEqual('Jack', row['name'])
+
+        out = io.StringIO()
+        ag.execCypher("MATCH (a:Person {name: 'Andy'}) RETURN a").exportNdjson(out, rowFormat="value")
+        self.assertEqual(30, json.loads(out.getvalue())['properties']['age'])
+        ag.commit()
+
+        print("\nTest 20 Successful...")
+
+    def testAgtypeParams(self):
+
+        print("\n-----------------------------------------")
+        print("Test 21: Testing agtype Serialization.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        props = {'name': 'Andy', 'balance': decimal.Decimal('12345678901234567890.12'), 'ratio': float('inf'), 'tags': ['a', 'b']}
+        ag.execCypher("CREATE (n:Person) SET n = $props", cypherParams={'props': props})
+        ag.commit()
+
+        vertex = ag.execCypher("MATCH (n:Person) RETURN n").fetchone()[0]
+        self.assertEqual(decimal.Decimal('12345678901234567890.12'), vertex['balance'])
+        self.assertEqual(float('inf'), vertex['ratio'])
+        self.assertEqual(['a', 'b'], vertex['tags'])
+
+        # Vertex objects and Agtype values are adapted to agtype literals.
+        with ag.connection.cursor() as cursor:
+            cursor.execute("SELECT %s, %s", (vertex, age.Agtype({'n': decimal.Decimal('1.5')})))
+            row = cursor.fetchone()
+            self.assertEqual(vertex.id, row[0].id)
+            self.assertEqual(decimal.Decimal('1.5'), row[1]['n'])
+        ag.commit()
+
+        print("\nTest 21 Successful...")
+
+
+    def testObserver(self):
+
+        print("\n-----------------------------------------")
+        print("Test 22: Testing Query Observers.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+
+        class Recorder(age.QueryObserver):
+            def __init__(self):
+                self.events = []
+                self.errors = []
+            def afterFetch(self, event):
+                self.events.append(event)
+            def onError(self, event, error):
+                self.errors.append(error)
+
+        recorder = Recorder()
+        hist = age.LatencyHistogram()
+        ag.addObserver(recorder).addObserver(hist)
+
+        ag.execCypher("CREATE (n:Person {name: 'Jack'}), (m:Person {name: 'Jill'})")
+        ag.commit()
+
+        cursor = ag.execCypher("MATCH (n:Person) RETURN n")
+        self.assertEqual(1, len(recorder.events))
+        names = [row[0]["name"] for row in cursor]
+        self.assertEqual(["Jack", "Jill"], sorted(names))
+        event = recorder.events[-1]
+        self.assertEqual(2, event.rows)
+        self.assertGreater(event.bytesReceived, 0)
+        self.assertGreater(event.decodeSeconds, 0)
+        self.assertGreaterEqual(event.totalSeconds, event.executeSeconds)
+
+        with self.assertRaises(Exception):
+            ag.execCypher("MATCH (n:Person RETURN n")
+        self.assertEqual(1, len(recorder.errors))
+
+        ag.removeObserver(recorder).removeObserver(hist)
+        ag.execCypher("MATCH (n:Person) RETURN n").fetchall()
+        self.assertEqual(2, len(recorder.events))
+        self.assertEqual(2, hist.snapshot()["total"]["count"])
+
+        # A failing observer does not fail or roll back the query.
+        class Broken(age.QueryObserver):
+            def afterExecute(self, event):
+                raise RuntimeError("broken")
+
+        broken = Broken()
+        ag.addObserver(broken)
+        ag.execCypher("CREATE (n:Person {name: 'Jane'})")
+        self.assertEqual(3, len(ag.execCypher("MATCH (n:Person) RETURN n").fetchall()))
+        ag.removeObserver(broken)
+        ag.commit()
+
+        print("\nTest 22 Successful...")
+
+
+    def testSlowQuerySampler(self):
+
+        print("\n-----------------------------------------")
+        print("Test 23: Testing Slow Query Sampler.....")
+        print("-----------------------------------------\n")
+
+        ag = self.ag
+        sampler = age.SlowQuerySampler(threshold=0.0)
+        ag.addObserver(sampler)
+
+        template = "MATCH (n:Person {name: %s}) RETURN n"
+        ag.execCypher("CREATE (n:Person {name: 'Joe'})")
+        ag.execCypher(template, params=('Joe',)).fetchall()
+        ag.execCypher("MATCH (n:Person {name: $name}) RETURN n", cypherParams={'name': 'Joe'}).fetchall()
+        ag.removeObserver(sampler)
+
+        plan = sampler.plans(template)[0]
+        self.assertIsNone(plan.error)
+        self.assertIn("Buffers", plan.plan)
+        self.assertEqual(1, len(sampler.plans("MATCH (n:Person {name: $name}) RETURN n")))
+
+        # The CREATE repeated by EXPLAIN ANALYZE was rolled back.
+        ag.commit()
+        self.assertEqual(1, len(ag.execCypher("MATCH (n:Person) RETURN n").fetchall()))
+        self.assertEqual(3, sampler.stats()["captured"])
+
+        print("\nTest 23 Successful...")
+
+
+class TestAgeAsync(unittest.IsolatedAsyncioTestCase):
+    ag = None
+    async def asyncSetUp(self):
+        from age import aio
+        print("Connecting to Test Graph (asyncio).....")
+        self.ag = await aio.connect(graph=TEST_GRAPH_NAME, host=TEST_HOST, port=TEST_PORT, dbname=TEST_DB, user=TEST_USER, password=TEST_PASSWORD)
+
+    async def asyncTearDown(self):
+        from age import aio
+        print("Deleting Test Graph.....")
+        await aio.deleteGraph(self.ag.connection, self.ag.graphName)
+        await self.ag.close()
+
+    async def testAsyncCypher(self):
+
+        print("\n-----------------------------------")
+        print("Test 14: Testing asyncio driver.....")
+        print("-----------------------------------\n")
+
+        ag = self.ag
+        await ag.execCypher("CREATE (n:Person {name: %s, title: 'Developer'}) RETURN n", params=('Andy',))
+        async with ag.connection.cursor() as cursor:
+            await ag.cypher(cursor, "CREATE (n:Person {name: $name}) ", cypherParams={'name': 'Jack'})
+        await ag.commit()
+
+        names = []
+        cursor = await ag.execCypher("MATCH (n:Person) RETURN n ORDER BY n.name")
+        async for row in cursor:
+            self.assertEqual(age.TP_VERTEX, row[0].gtype)
+            names.append(row[0]['name'])
+        self.assertEqual(['Andy', 'Jack'], names)
+
+        cursor = await ag.execCypher("MATCH (n:Person {name: $name}) RETURN n.title", cypherParams={'name': 'Andy'}, binary=True)
+        self.assertEqual('Developer', (await cursor.fetchone())[0])
+
+        print("\nTest 14 Successful...")
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -412,5 +921,21 @@ if __name__ == '__main__':
     suite.addTest(TestAgeBasic('testMultipleEdges'))
     suite.addTest(TestAgeBasic('testCollect'))
     suite.addTest(TestAgeBasic('testSerialization'))
+    suite.addTest(TestAgeBasic('testPreparedCache'))
+    suite.addTest(TestAgeBasic('testCypherParams'))
+    suite.addTest(TestAgeBasic('testBulkLoadVertices'))
+    suite.addTest(TestAgeBasic('testBulkLoadEdges'))
+    suite.addTest(TestAgeBasic('testExecBatch'))
+    suite.addTest(TestAgeBasic('testStream'))
+    suite.addTest(TestAgeBasic('testPool'))
+    suite.addTest(TestAgeBasic('testParallelDecode'))
+    suite.addTest(TestAgeBasic('testIdentityMap'))
+    suite.addTest(TestAgeBasic('testToGraph'))
+    suite.addTest(TestAgeBasic('testColumnar'))
+    suite.addTest(TestAgeBasic('testNdjson'))
+    suite.addTest(TestAgeBasic('testAgtypeParams'))
+    suite.addTest(TestAgeBasic('testObserver'))
+    suite.addTest(TestAgeBasic('testSlowQuerySampler'))
+    suite.addTest(TestAgeAsync('testAsyncCypher'))
     TestAgeBasic.args = args
     unittest.TextTestRunner().run(suite)
@@ -19,6 +19,36 @@ import math
 import age
 
 
+class FakeCursor:
+    """Serves 'rows' like a client side cursor that has executed its query."""
+    name = None
+    arraysize = 1
+    itersize = 2
+
+    def __init__(self, rows, description=None):
+        self.rows = rows
+        self.description = description
+        self.rowcount = len(rows)
+        self.rownumber = 0
+
+    # fetchone and fetchall read through FakeCursor.fetchmany, so a subclass
+    # overriding fetchmany does not see them twice.
+    def fetchone(self):
+        chunk = FakeCursor.fetchmany(self, 1)
+        return chunk[0] if len(chunk) > 0 else None
+
+    def fetchmany(self, size):
+        chunk = self.rows[self.rownumber:self.rownumber + size]
+        self.rownumber += len(chunk)
+        return chunk
+
+    def fetchall(self):
+        return FakeCursor.fetchmany(self, self.rowcount)
+
+    def close(self):
+        pass
+
+
 class TestAgtype(unittest.TestCase):
     resultHandler = None
 
@@ -127,6 +157,576 @@ class TestAgtype(unittest.TestCase):
         self.assertEqual(vertexEnd.label,  "Person")
         self.assertEqual(vertexEnd["name"],  "Joe")
 
+    def test_antlr_parity(self):
+
+        print("\nTesting AgtypeDecoder against Antlr4ResultHandler. Result : ",  end='')
+
+        antlrHandler = age.builder.Antlr4ResultHandler(None)
+        exps = [
+            '{"name": "Smith", "num":123, "yn":true, "nothing": null, "empty": {}, "list": []}',
+            '[1, -2, 3.5, -4.5e-3, 6E+2, 0, -0, 1.5::numeric, "x"]',
+            '{"id": 1, "label": "A", "properties": {"n": [{"a": [1, {"b": 2}]}], "z": -12.25::numeric}}::vertex',
+            '[{"id": 1, "label": "A", "properties": {}}::vertex, {"id": 3, "label": "E", "end_id": 2, "start_id": 1, "properties": {}}::edge, {"id": 2, "label": "A", "properties": {}}::vertex]::path',
+        ]
+        for exp in exps:
+            self.assertEqual(str(self.parse(exp)), str(antlrHandler.parse(exp)))
+
+    def test_syntax(self):
+
+        print("\nTesting whitespace, escapes and errors. Result : ",  end='')
+
+        self.assertEqual(self.parse(' [ 1 ,\n\t2 ] '), [1, 2])
+        self.assertEqual(self.parse('12.5 :: numeric'), Decimal("12.5"))
+        self.assertEqual(self.parse('{"a": 1}::unknown'), {"a": 1})
+        self.assertEqual(self.parse('"a\\"b\\u00e9"'), 'a"b\u00e9')
+        self.assertEqual(self.parse('-Infinity'), float('-inf'))
+
+        for exp in ['[1,', '{"a" 1}', '1 2', 'tru', '{"a":1,}', '1::']:
+            with self.assertRaises(age.exceptions.AGTypeError):
+                self.parse(exp)
+
+    def test_json_fast_path(self):
+
+        print("\nTesting json fast path. Result : ",  end='')
+
+        fast = age.AgtypeDecoder(jsonFastPath=True)
+        scanner = age.AgtypeDecoder(jsonFastPath=False)
+        exps = ['{"name": "Smith", "num": -123, "f": 6.45161290322581e+46, "yn": false, "n": null}',
+                '[1.5, NaN, Infinity, -Infinity, "a::b", [], {}]',
+                '"abcd"', '1234', '1234.56789', 'true']
+        for exp in exps:
+            self.assertEqual(str(fast.parse(exp)), str(scanner.parse(exp)))
+
+        nanVal = fast.parse('[NaN, -Infinity]')
+        self.assertTrue(math.isnan(nanVal[0]))
+        self.assertEqual(nanVal[1], float('-inf'))
+        self.assertIsInstance(fast.parse('123456789123456789123456789'), int)
+
+        with self.assertRaises(age.exceptions.AGTypeError):
+            fast.parse('{"a": }')
+
+    def test_binary(self):
+
+        print("\nTesting binary format Parsing. Result : ",  end='')
+
+        vertex = self.resultHandler.parseBinary(
+            b'\x01{"id": 1, "label": "Person", "properties": {"name": "J\xc3\xb6e", "n": 1.5::numeric}}::vertex')
+        self.assertEqual(vertex.id, 1)
+        self.assertEqual(vertex["name"], "J\u00f6e")
+        self.assertEqual(vertex["n"], Decimal("1.5"))
+        self.assertEqual(self.resultHandler.parseBinary(memoryview(b'\x01[1, 2]')), [1, 2])
+
+        with self.assertRaises(age.exceptions.AGTypeError):
+            self.resultHandler.parseBinary(b'\x02[1, 2]')
+
+    def test_threads(self):
+
+        print("\nTesting Parsing from several threads. Result : ",  end='')
+
+        import threading
+        from age.builder import threadResultHandler
+
+        rows = ['{"id": %d, "label": "Person", "properties": {"seq": %d}}::vertex' % (i, i) for i in range(500)]
+        results = {}
+        handlers = {}
+        def decode(n):
+            handlers[n] = threadResultHandler()
+            results[n] = [age.parseAgeValue(row)["seq"] for row in rows]
+
+        threads = [threading.Thread(target=decode, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for n in range(4):
+            self.assertEqual(list(range(500)), results[n])
+        self.assertEqual(4, len(set(id(h) for h in handlers.values())))
+
+    def test_lazy_properties(self):
+
+        print("\nTesting Lazy Properties Parsing. Result : ",  end='')
+
+        lazy = age.AgtypeDecoder(None, lazyProperties=True)
+        exp = '[{"id": 1, "label": "A", "properties": {"n": 1.5::numeric, "s": "}\\"{"}}::vertex, ' \
+              '{"id": 3, "label": "r", "end_id": 2, "start_id": 1, "properties": {"w": [{"a": 2}]}}::edge, ' \
+              '{"properties": {"q": 1}}]'
+        vertex, edge, plain = lazy.parse(exp)
+
+        self.assertIsInstance(vertex._properties, age.models.LazyProperties)
+        self.assertEqual(vertex.id, 1)
+        self.assertEqual(vertex["n"], Decimal("1.5"))
+        self.assertEqual(vertex["s"], '}"{')
+        self.assertIsInstance(vertex._properties, dict)
+        self.assertEqual(edge.properties, {"w": [{"a": 2}]})
+        # Maps that are not vertices or edges are decoded as usual.
+        self.assertEqual(plain, {"properties": {"q": 1}})
+        self.assertEqual(str(lazy.parse(exp)), str(self.parse(exp)))
+
+    def test_identity_map(self):
+
+        print("\nTesting Identity Map Parsing. Result : ",  end='')
+
+        identityMap = age.IdentityMap(2)
+        decoder = age.AgtypeDecoder(identityMap)
+        hub = '{"id": 1, "label": "A", "properties": {}}::vertex'
+        knows = '{"id": 9, "label": "r", "end_id": 2, "start_id": 1, "properties": {}}::edge'
+        rows = [decoder.parse('[' + hub + ', ' + knows + ', ' + hub + ']::path') for _ in range(3)]
+
+        self.assertIs(rows[0][0], rows[0][2])
+        self.assertIs(rows[0][0], rows[2][0])
+        self.assertIs(rows[0][1], rows[2][1])
+        self.assertEqual(2, len(identityMap))
+
+        decoder.parse('{"id": 2, "label": "A", "properties": {}}::vertex')
+        self.assertEqual(2, len(identityMap))
+        self.assertEqual(1, identityMap.evictions)
+        # The hub was used last, the edge is the least recently used.
+        self.assertIn(1, identityMap)
+        self.assertNotIn(9, identityMap)
+
+        # A map kept across queries sees the changes of SET and REMOVE.
+        hubObject = identityMap[1]
+        changed = decoder.parse('{"id": 1, "label": "B", "properties": {"n": 1}}::vertex')
+        self.assertIs(hubObject, changed)
+        self.assertEqual("B", changed.label)
+        self.assertEqual({"n": 1}, changed.properties)
+        lazy = age.AgtypeDecoder(identityMap, lazyProperties=True)
+        self.assertEqual({}, lazy.parse('{"id": 1, "label": "B", "properties": {}}::vertex').properties)
+        self.assertEqual({}, hubObject.properties)
+
+    def test_to_graph(self):
+
+        print("\nTesting Graph Materializing. Result : ",  end='')
+
+        path = '[{"id": 1, "label": "A", "properties": {}}::vertex, ' \
+               '{"id": 9, "label": "r", "end_id": 2, "start_id": 1, "properties": {}}::edge, ' \
+               '{"id": 2, "label": "A", "properties": {}}::vertex]::path'
+        edge = '{"id": 10, "label": "r", "end_id": 1, "start_id": 3, "properties": {}}::edge'
+        rows = [(self.parse(path), self.parse(edge)), (self.parse(path), [self.parse(edge)])]
+
+        graph = age.toGraph(rows)
+        self.assertEqual(2, len(graph))
+        self.assertEqual([1, 2], sorted(graph.vertices))
+        self.assertEqual([9, 10], sorted(graph.edges))
+        self.assertIs(rows[0][0][0], graph.getVertex(1))
+        self.assertEqual([9], [e.id for e in graph.outgoing(1)])
+        self.assertEqual([10], [e.id for e in graph.incoming(1)])
+        self.assertEqual([2, 3], graph.neighbors(1))
+        self.assertEqual([2], graph.neighbors(1, "out"))
+        self.assertEqual([], graph.outgoing(2))
+
+    def test_columnar(self):
+
+        print("\nTesting Columnar Parsing. Result : ",  end='')
+
+        AGTYPE, TEXT = 7000, 25
+        columns = [("n", AGTYPE), ("score", AGTYPE)]
+
+        rows = [
+            ('{"id": 1, "label": "A", "properties": {"age": 30, "w": 1}}::vertex', '1'),
+            ('{"id": 2, "label": "B", "properties": {"age": 40, "w": 2.5, "tag": "x"}}::vertex', '2.5'),
+            (None, None),
+            (self.parse('{"id": 3, "label": "A", "properties": {"w": 123456789123456789123456789}}::vertex'), 'null'),
+        ]
+        result = age.columnar.fetchColumnar(FakeCursor(rows, columns), props=["age", "w", "tag"], chunkSize=3, rawOid=AGTYPE)
+        self.assertEqual(4, len(result))
+        self.assertEqual([1, 2, None, 3], result.ids.toList())
+        self.assertEqual('q', result.ids.values.typecode)
+        self.assertEqual(["A", "B"], result.labels.categories)
+        self.assertEqual([0, 1, -1, 0], list(result.labels.codes))
+        self.assertEqual('q', result["age"].values.typecode)
+        self.assertEqual([30, 40, None, None], result["age"].toList())
+        self.assertEqual(bytearray([1, 1, 0, 0]), result["age"].valid)
+        self.assertEqual(age.columnar.KIND_OBJECT, result["w"].kind)
+        self.assertEqual([None, "x", None, None], result["tag"].toList())
+        self.assertNotIn("start_id", result.toPydict())
+
+        result = age.columnar.fetchColumnar(FakeCursor(rows, columns), rawOid=AGTYPE)
+        self.assertEqual('d', result["score"].values.typecode)
+        self.assertEqual([1.0, 2.5, None, None], result["score"].toList())
+        self.assertEqual(1, result["n"].nullCount())
+
+        # Decoded rows: strings are values, not agtype text.
+        decoded = [("Andy", 1), ("123", 2.5), (None, None)]
+        result = age.columnar.fetchColumnar(FakeCursor(decoded, columns))
+        self.assertEqual(["Andy", "123", None], result["n"].toList())
+        self.assertEqual([1.0, 2.5, None], result["score"].toList())
+        vertex = self.parse('{"id": 4, "label": "A", "properties": {"age": 50}}::vertex')
+        result = age.columnar.fetchColumnar(FakeCursor([(vertex,)], columns), props=["age"])
+        self.assertEqual([50], result["age"].toList())
+        with self.assertRaises(TypeError):
+            age.columnar.fetchColumnar(FakeCursor([("Andy",)], columns), props=["age"])
+
+        # Only agtype columns hold raw text, a text column is kept as it is.
+        mixed = [('1', 'Andy'), ('2.5', '123'), (None, None)]
+        result = age.columnar.fetchColumnar(FakeCursor(mixed, [("score", AGTYPE), ("name", TEXT)]), rawOid=AGTYPE)
+        self.assertEqual([1.0, 2.5, None], result["score"].toList())
+        self.assertEqual(["Andy", "123", None], result["name"].toList())
+
+        # Raw edges: nested values are skipped, only wanted properties are decoded.
+        edges = [(' { "id" : 7, "label": "r\\u00e9", "end_id": 2, "start_id": 1, '
+                  '"properties": {"skip": [{"a": "}]"}, 1.5::numeric], "w": 2.5::numeric, "s": "x\\"y"}}::edge',),
+                 ('{"id": 8, "label": "r", "end_id": 3, "start_id": 2, "properties": {}}::edge',)]
+        result = age.columnar.fetchColumnar(FakeCursor(edges, [("e", AGTYPE)]), props=["w", "s"], rawOid=AGTYPE)
+        self.assertEqual([7, 8], result.ids.toList())
+        self.assertEqual(["r\u00e9", "r"], result.labels.toList())
+        self.assertEqual([1, 2], result.startIds.toList())
+        self.assertEqual([2, 3], result.endIds.toList())
+        self.assertEqual([Decimal("2.5"), None], result["w"].toList())
+        self.assertEqual(['x"y', None], result["s"].toList())
+
+    def test_json(self):
+
+        print("\nTesting JSON Export. Result : ",  end='')
+
+        import io
+        import json
+        from age.export import exportNdjson, stripAnnotations
+
+        exp = '{"id": 1, "label": "A", "properties": {"n": 1.5::numeric, "a": [1, {"b": null}], "s": "x::y"}}::vertex'
+        vertex = self.parse(exp)
+        self.assertEqual({"gtype": "vertex", "label": "A", "id": 1, "properties": {"n": 1.5, "a": [1, {"b": None}], "s": "x::y"}},
+                         json.loads(vertex.toJson()))
+        edge = self.parse('{"id": 3, "label": "r", "end_id": 2, "start_id": 1, "properties": {"w": 2}}::edge')
+        self.assertEqual(1, json.loads(edge.toJson())["start_id"])
+        self.assertEqual({"w": 2}, json.loads(edge.toJson())["properties"])
+
+        self.assertEqual('{"id": 1, "label": "A", "properties": {"n": 1.5, "a": [1, {"b": null}], "s": "x::y"}}',
+                         stripAnnotations(exp))
+        self.assertEqual('[1, "a"]', stripAnnotations('[1, "a"]'))
+
+        AGTYPE, TEXT = 7000, 25
+        columns = [("n", AGTYPE), ("c", AGTYPE)]
+
+        out = io.StringIO()
+        self.assertEqual(3, exportNdjson(FakeCursor([(exp, '2'), (None, '"x"'), (exp, '[]')], columns), out, rawOid=AGTYPE, chunkSize=2))
+        lines = out.getvalue().split("\n")
+        self.assertEqual(4, len(lines))
+        self.assertEqual("", lines[3])
+        self.assertEqual({"n": None, "c": "x"}, json.loads(lines[1]))
+        self.assertEqual(1.5, json.loads(lines[0])["n"]["properties"]["n"])
+
+        out = io.StringIO()
+        exportNdjson(FakeCursor([(vertex, Decimal("1.10"))], columns), out, rowFormat="array")
+        self.assertEqual('[' + stripAnnotations(exp) + ', 1.10]\n', out.getvalue())
+
+        # Raw and decoded rows are exported the same, NaN and infinite numbers as null.
+        texts = [exp,
+                 '{"id": 3, "label": "r", "end_id": 2, "start_id": 1, "properties": {"w": 2}}::edge',
+                 '[{"id": 1, "label": "A", "properties": {}}::vertex, '
+                 '{"id": 3, "label": "r", "end_id": 2, "start_id": 1, "properties": {}}::edge, '
+                 '{"id": 2, "label": "A", "properties": {}}::vertex]::path',
+                 '{"f": NaN, "g": [Infinity, -Infinity], "d": NaN::numeric, "s": "NaN"}']
+        rawOut, decodedOut = io.StringIO(), io.StringIO()
+        exportNdjson(FakeCursor([(t,) for t in texts], columns), rawOut, rawOid=AGTYPE, rowFormat="value")
+        exportNdjson(FakeCursor([(self.parse(t),) for t in texts], columns), decodedOut, rowFormat="value")
+        rawLines = [json.loads(line) for line in rawOut.getvalue().splitlines()]
+        self.assertEqual(rawLines, [json.loads(line) for line in decodedOut.getvalue().splitlines()])
+        self.assertEqual({"f": None, "g": [None, None], "d": None, "s": "NaN"}, rawLines[3])
+        self.assertEqual([1, 3, 2], [e["id"] for e in rawLines[2]])
+        self.assertNotIn("NaN", decodedOut.getvalue().replace('"NaN"', ''))
+
+        # A text column is a JSON string, only the agtype column is raw.
+        out = io.StringIO()
+        exportNdjson(FakeCursor([('1.5::numeric', 'Andy'), ('[1]', 'x::y')], [("n", AGTYPE), ("name", TEXT)]), out, rawOid=AGTYPE)
+        self.assertEqual([{"n": 1.5, "name": "Andy"}, {"n": [1], "name": "x::y"}],
+                         [json.loads(line) for line in out.getvalue().splitlines()])
+
+    def test_encoder(self):
+
+        print("\nTesting agtype Serialization. Result : ",  end='')
+
+        toAgtype = age.toAgtype
+        self.assertEqual('{"a": [1, 2.5, null, true], "b": "x\'y"}', toAgtype({"a": [1, 2.5, None, True], "b": "x'y"}))
+        self.assertEqual('[NaN, Infinity, -Infinity]', toAgtype([float('nan'), float('inf'), float('-inf')]))
+        self.assertEqual('{"n": 123456789123456789123456789.5::numeric}', toAgtype({"n": Decimal("123456789123456789123456789.5")}))
+
+        exp = '[{"id": 1, "label": "A", "properties": {"n": 1.5::numeric, "s": "\\u00e9\\n"}}::vertex, ' \
+              '{"id": 3, "label": "r", "end_id": 2, "start_id": 1, "properties": {}}::edge, ' \
+              '{"id": 2, "label": "A", "properties": {}}::vertex]::path'
+        path = self.parse(exp)
+        self.assertEqual(exp, toAgtype(path))
+        self.assertEqual(str(path), str(self.parse(toAgtype(path))))
+        self.assertEqual(self.parse(toAgtype({"p": path}))["p"][1].start_id, 1)
+
+        self.assertEqual(b"'{\"s\": \"it''s\"}'::agtype", age.Agtype({"s": "it's"}).getquoted())
+        with self.assertRaises(TypeError):
+            toAgtype({"x": object()})
+
+    def test_prepared_statements(self):
+
+        print("\nTesting Prepared Statements. Result : ",  end='')
+
+        import psycopg2
+        from psycopg2 import extensions as ext
+
+        # Quoting only needs a connection object and its encoding, not a server:
+        # the asynchronous connect is never polled.
+        class QuotingContext(ext.connection):
+            encoding = 'UTF8'
+        conn = psycopg2.connect("host=127.0.0.1 port=1 dbname=x", async_=1, connection_factory=QuotingContext)
+        self.addCleanup(conn.close)
+
+        cache = age.StatementCache(maxSize=1)
+        stmt = "MATCH (n {name: $name}) RETURN n"
+        prepareStmt, executeStmt, key = age.age.buildExecuteCypher(conn, cache, "g", stmt, ["n"], {"name": "it's"})
+        self.assertEqual(("g", stmt, ("n",)), key)
+        self.assertEqual("PREPARE \"age_stmt_1\"(agtype) AS SELECT * from cypher('g', "
+                         "$cypher$MATCH (n {name: $name}) RETURN n$cypher$, $1) as (n agtype);", prepareStmt)
+        self.assertEqual("EXECUTE \"age_stmt_1\"('{\"name\": \"it''s\"}');", executeStmt)
+
+        # A hit only executes; the columns are part of the key.
+        prepareStmt, executeStmt, key = age.age.buildExecuteCypher(conn, cache, "g", stmt, ["n"], None)
+        self.assertEqual(None, prepareStmt)
+        self.assertEqual("EXECUTE \"age_stmt_1\"('{}');", executeStmt)
+        self.assertEqual(1, cache.hits)
+        self.assertNotEqual(key, age.age.buildExecuteCypher(conn, cache, "g", stmt, None, None)[2])
+
+        # A miss deallocates what the cache evicted before preparing.
+        prepareStmt, executeStmt, key = age.age.buildExecuteCypher(conn, cache, "g", "RETURN '$cypher$'", None, None)
+        self.assertEqual("DEALLOCATE \"age_stmt_2\";PREPARE \"age_stmt_3\"(agtype) AS SELECT * from cypher('g', "
+                         "$cypher1$RETURN '$cypher$'$cypher1$, $1) as (v agtype);", prepareStmt)
+        self.assertEqual(("g", "RETURN '$cypher$'", None), key)
+
+        # A statement that can not be built leaves the cache alone.
+        with self.assertRaises(age.GraphNotSet):
+            age.age.buildExecuteCypher(conn, cache, None, stmt, None, None)
+        self.assertEqual(1, len(cache))
+
+        self.assertEqual("SELECT * FROM age_prepare_cypher('g','RETURN ''a''');"
+                         "SELECT * from cypher(NULL,NULL) as (v agtype);",
+                         age.age.buildPreparedCypher(conn, "g", "RETURN 'a'", None))
+
+    def test_parallel_decode(self):
+
+        print("\nTesting Parallel Decoding. Result : ",  end='')
+
+        import pickle
+        from concurrent.futures import ProcessPoolExecutor
+        from age.parallel import iterDecoded
+
+        path = self.parse('[{"id": 1, "label": "A", "properties": {"n": 1}}::vertex, '
+                          '{"id": 3, "label": "r", "end_id": 2, "start_id": 1, "properties": {}}::edge, '
+                          '{"id": 2, "label": "A", "properties": {"n": 2}}::vertex]::path')
+        copy = pickle.loads(pickle.dumps(path))
+        self.assertFalse(hasattr(copy[0], "__dict__"))
+        self.assertFalse(hasattr(copy[1], "__dict__"))
+        self.assertIsNot(age.models.Path().entities, age.models.Path().entities)
+        self.assertEqual(str(path), str(copy))
+        self.assertEqual(copy[1].start_id, 1)
+        self.assertEqual(copy[1].end_id, 2)
+
+        AGTYPE, TEXT = 7000, 25
+        columns = [("n", AGTYPE), ("seq", AGTYPE), ("none", AGTYPE), ("name", TEXT)]
+        rows = [('{"id": %d, "label": "A", "properties": {"n": %d}}::vertex' % (i, i), str(i), None, str(i)) for i in range(250)]
+        decoder = age.AgtypeDecoder(None, jsonFastPath=False)
+        with ProcessPoolExecutor(2) as executor:
+            decoded = list(iterDecoded(FakeCursor(rows, columns), executor, AGTYPE, chunkSize=40, prefetch=3, decoder=decoder))
+            with self.assertRaises(ValueError):
+                list(iterDecoded(FakeCursor(rows, columns), executor, AGTYPE, decoder=age.AgtypeDecoder(age.IdentityMap())))
+        self.assertEqual(250, len(decoded))
+        for i, row in enumerate(decoded):
+            self.assertEqual(i, row[0]["n"])
+            self.assertEqual(i, row[1])
+            self.assertIsNone(row[2])
+            # A text column is not decoded.
+            self.assertEqual(str(i), row[3])
+
+    def test_observer(self):
+
+        print("\nTesting Query Observers. Result : ",  end='')
+
+        from age.observer import QueryEvent, observedCursorClass
+
+        class Recorder(age.QueryObserver):
+            def __init__(self):
+                self.calls = []
+            def beforeExecute(self, event):
+                self.calls.append("before")
+            def afterExecute(self, event):
+                self.calls.append("execute")
+            def afterFetch(self, event):
+                self.calls.append("fetch")
+            def onError(self, event, error):
+                self.calls.append("error")
+
+        recorder = Recorder()
+        hist = age.LatencyHistogram(buckets=(0.5, 1.0))
+        cursor = observedCursorClass(FakeCursor)([(1,), (2,), (3,)])
+        self.assertIs(type(cursor), observedCursorClass(FakeCursor))
+        event = cursor.ageEvent = QueryEvent((recorder, hist), None, "g", "MATCH (n) RETURN n", "SELECT ...").start()
+        cursor._executed()
+        self.assertEqual(["before", "execute"], recorder.calls)
+        self.assertEqual(1, cursor.fetchone()[0])
+        self.assertEqual([(2,), (3,)], list(cursor))
+        self.assertEqual(["before", "execute", "fetch"], recorder.calls)
+        self.assertEqual(3, event.rows)
+        cursor.close()
+        self.assertEqual(["before", "execute", "fetch"], recorder.calls)
+
+        # An empty result is done once executed, a failure is reported once.
+        cursor = observedCursorClass(FakeCursor)([])
+        cursor.ageEvent = QueryEvent((hist,), None, "g", "", "").start()
+        cursor._executed()
+        failed = QueryEvent((recorder, hist), None, "g", "", "").start()
+        failed.fail(ValueError())
+        failed.finish()
+        self.assertEqual("error", recorder.calls[-1])
+
+        snapshot = hist.snapshot()
+        self.assertEqual(3, snapshot["rows"])
+        self.assertEqual(1, snapshot["errors"])
+        self.assertEqual(2, snapshot["total"]["count"])
+        self.assertEqual([(0.5, 2), (1.0, 2), (float("inf"), 2)], snapshot["total"]["buckets"])
+
+        # A failing observer is logged; later observers still run.
+        class Broken(age.QueryObserver):
+            def afterExecute(self, event):
+                raise RuntimeError("broken")
+            def afterFetch(self, event):
+                raise RuntimeError("broken")
+
+        event = QueryEvent((Broken(), recorder), None, "g", "", "").start()
+        with self.assertLogs("age.observer", "ERROR") as logs:
+            event.executed()
+            event.finish()
+        self.assertEqual(2, len(logs.records))
+        self.assertEqual(["before", "execute", "fetch"], recorder.calls[-3:])
+
+    def test_pool(self):
+
+        print("\nTesting Connection Pool. Result : ",  end='')
+
+        from psycopg2 import extensions as ext
+
+        class Connection:
+            closed = False
+            def __init__(self):
+                self.queries = 0
+            def get_transaction_status(self):
+                return ext.TRANSACTION_STATUS_IDLE
+            def cursor(self):
+                conn = self
+                class Cursor:
+                    def __enter__(self):
+                        return self
+                    def __exit__(self, *args):
+                        pass
+                    def execute(self, stmt):
+                        conn.queries += 1
+                return Cursor()
+            def rollback(self):
+                pass
+
+        class FakeAge:
+            def __init__(self):
+                self.connection = Connection()
+            def close(self):
+                self.connection.closed = True
+
+        class Pool(age.AgePool):
+            failAt = None
+            openedAges = []
+            def _open(self):
+                if len(Pool.openedAges) == self.failAt:
+                    with self._lock:
+                        self._opened -= 1
+                    raise age.PoolError("connect failed")
+                ag = FakeAge()
+                Pool.openedAges.append(ag)
+                self._uses[ag] = 0
+                return ag
+
+        # Recently used connections are not health checked, idle ones are.
+        pool = Pool(minSize=1, maxSize=2, checkIdleAfter=60)
+        ag = pool.getconn()
+        pool.putconn(ag)
+        self.assertIs(ag, pool.getconn())
+        self.assertEqual(0, ag.connection.queries)
+        pool.putconn(ag)
+        pool.checkIdleAfter = 0
+        pool.putconn(pool.getconn())
+        self.assertEqual(1, ag.connection.queries)
+
+        # A connection returned twice or from elsewhere is refused.
+        with self.assertRaises(age.PoolError):
+            pool.putconn(ag)
+        with self.assertRaises(age.PoolError):
+            pool.putconn(FakeAge())
+        self.assertEqual(1, pool.stats()["idle"])
+        pool.close()
+
+        # Connections opened before a failing one are closed.
+        Pool.openedAges = []
+        Pool.failAt = 2
+        with self.assertRaises(age.PoolError):
+            Pool(minSize=3, maxSize=3)
+        self.assertEqual([True, True], [ag.connection.closed for ag in Pool.openedAges])
+
+    def test_slow_query_sampler(self):
+
+        print("\nTesting Slow Query Sampler. Result : ",  end='')
+
+        from psycopg2 import extensions as ext
+        from age.observer import QueryEvent
+
+        class Cursor:
+            def __init__(self, log):
+                self.log = log
+            def __enter__(self):
+                return self
+            def __exit__(self, *args):
+                pass
+            def execute(self, stmt):
+                self.log.append(stmt)
+            def fetchall(self):
+                return [("Seq Scan on \"Person\"",), ("  Buffers: shared hit=1",)]
+
+        class Connection:
+            autocommit = False
+            def __init__(self):
+                self.log = []
+            def get_transaction_status(self):
+                return ext.TRANSACTION_STATUS_INTRANS
+            def cursor(self):
+                return Cursor(self.log)
+
+        conn = Connection()
+        sampler = age.SlowQuerySampler(threshold=0.5, maxTemplates=2, plansPerTemplate=2)
+
+        def run(template, seconds):
+            event = QueryEvent((sampler,), conn, "g", template, "batch", lambda: "SELECT " + template)
+            event.executeSeconds = seconds
+            sampler.afterExecute(event)
+
+        run("fast", 0.1)
+        self.assertEqual([], conn.log)
+        run("slow", 0.7)
+        self.assertEqual(["SAVEPOINT age_explain", "EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) SELECT slow",
+                          "ROLLBACK TO SAVEPOINT age_explain;RELEASE SAVEPOINT age_explain"], conn.log)
+        plan = sampler.plans("slow")[0]
+        self.assertEqual("slow", plan.reason)
+        self.assertEqual("Seq Scan on \"Person\"\n  Buffers: shared hit=1", plan.plan)
+
+        # The newest plansPerTemplate plans of the maxTemplates most recent templates are kept.
+        for seconds in (1.0, 2.0, 3.0):
+            run("slow", seconds)
+        run("other", 0.9)
+        run("third", 0.9)
+        self.assertEqual(["other", "third"], sampler.templates())
+        run("other", 1.5)
+        self.assertEqual([0.9, 1.5], [p.seconds for p in sampler.plans("other")])
+        self.assertEqual(7, sampler.stats()["captured"])
+
+        conn = Connection()
+        conn.autocommit = True
+        sampler = age.SlowQuerySampler(threshold=None, sampleRate=1.0)
+        run("sampled", 0.0)
+        self.assertEqual("BEGIN", conn.log[0])
+        self.assertEqual("ROLLBACK", conn.log[-1])
+        self.assertEqual("sampled", sampler.plans()[0].reason)
+
 
 if __name__ == '__main__':
     unittest.main()